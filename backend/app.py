@@ -1,17 +1,29 @@
 # app.py
-from flask import Flask, request, jsonify, session
-from flask_session import Session  # Import Flask-Session
+from flask import Flask, Response, g, request, jsonify, session
 from flask_cors import CORS
-import qrcode
-import io
 import base64
+import binascii
+import csv
+import json
 import traceback
 import logging
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from werkzeug.security import generate_password_hash, check_password_hash
+from psycopg2.extras import Json, execute_values
+from qrcode.exceptions import DataOverflowError
 from datetime import datetime, timedelta, timezone
+from contextlib import nullcontext
 import re
+from qr_render import RENDER_MIMETYPES, normalize_render_options, render_options_from_args, render_key, render_image, render_styled, stored_image_to_png
+from qr_styles import StyleTemplate, TemplateCache, UnknownStyle, normalize_style, style_hash
+from qr_cache import create_render_cache
+from qr_batch import render_many, stream_zip, stream_zip_entries
+from qr_storage import QuotaExceeded, StorageMaintenance, reserve_quota, release_quota, acquire_assets, release_assets, store_asset_images
+from qr_io import IMPORT_FORMATS, detect_import_format, read_import_texts, batched, isoformat_utc, ndjson_record
+from db import ConnectionPool, TimedCursor
+from passwords import PasswordHasher, HashingBusy
+from sessions import init_sessions
+from metrics import registry
+from profiler import SlowRequestProfiler
+import time
 
 # Create Flask app
 app = Flask(__name__)
@@ -19,19 +31,63 @@ app = Flask(__name__)
 # Secret key for sessions, should be set to something more secure in production
 app.secret_key = "your_secret_key"  # Replace with a secure secret key
 
-'''
-flask-session alternative config
-'''
-# Configure session to use filesystem (server-side session)
-app.config['SESSION_TYPE'] = 'filesystem'
+# Session backend: 'memory' (single node, swept in the background), 'redis' (shared across workers and hosts)
+# or 'cookie' (stateless signed cookies). Server-side stores are only written when the session changes,
+# other requests on a permanent session just refresh its expiry.
+SESSION_CONFIG = {
+    'backend': 'memory',
+    'redis_url': 'redis://localhost:6379/0',
+    'sweep_interval': 60,
+}
+
+init_sessions(app, SESSION_CONFIG)
+
+# Metrics are exposed at /metrics. The sampling profiler is opt-in and writes folded stacks
+# (flamegraph.pl / speedscope input) for requests slower than 'slow_request_seconds'.
+METRICS_CONFIG = {
+    'profile_slow_requests': False,
+    'slow_request_seconds': 1.0,
+    'profile_interval': 0.005,
+    'profile_directory': 'profiles',
+}
+
+REQUEST_SECONDS = registry.histogram('http_request_duration_seconds', 'Request latency by route, until the response is returned.')
+REQUESTS_TOTAL = registry.counter('http_requests_total', 'Requests by route, method and status.')
+ERRORS_TOTAL = registry.counter('http_request_errors_total', 'Requests answered with a 5xx status, by route.')
+BASE64_SECONDS = registry.histogram('qr_base64_encode_seconds', 'Time spent base64-encoding images for JSON responses.')
+
+request_profiler = None
+if METRICS_CONFIG['profile_slow_requests']:
+    request_profiler = SlowRequestProfiler(
+        METRICS_CONFIG['profile_directory'],
+        slow_seconds=METRICS_CONFIG['slow_request_seconds'],
+        interval=METRICS_CONFIG['profile_interval'],
+    )
+    request_profiler.start()
 
-# Initialize the extension
-Session(app)
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if request_profiler is not None:
+        request_profiler.begin()
+
+@app.after_request
+def record_request_metrics(response):
+    duration = time.perf_counter() - g.pop('request_started', time.perf_counter())
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(duration, route=route, method=request.method)
+    REQUESTS_TOTAL.inc(route=route, method=request.method, status=response.status_code)
+    if response.status_code >= 500:
+        ERRORS_TOTAL.inc(route=route)
+    if request_profiler is not None:
+        request_profiler.end(duration, f"{request.method}-{route}")
+    return response
 
 # Update CORS configuration to allow credentials
 CORS(
     app,
     supports_credentials=True,
+    expose_headers=["X-Next-Cursor"],
     resources={
         r"/*": {"origins": "http://localhost:5173"},
         r"/generate-qr": {"origins": "http://localhost:5173"},
@@ -58,32 +114,350 @@ DATABASE_CONFIG = {
     'port': '5432'
 }
 
+# Render cache configuration, 'backend' can be None, 'disk' or 'redis' to share renders between workers.
+# The disk backend is swept every 'disk_sweep_interval' seconds back under its own entry and byte limits.
+QR_CACHE_CONFIG = {
+    'max_entries': 1024,
+    'max_bytes': 64 * 1024 * 1024,
+    'ttl': 3600,
+    'backend': None,
+    'disk_directory': 'qr_cache',
+    'disk_max_entries': 16384,
+    'disk_max_bytes': 256 * 1024 * 1024,
+    'disk_sweep_interval': 60,
+    'redis_url': 'redis://localhost:6379/0',
+}
+
+render_cache = create_render_cache(QR_CACHE_CONFIG)
+
+# Bulk import limits and export streaming, 'itersize' is how many rows each server-side cursor fetch returns
+QR_IMPORT_CONFIG = {
+    'max_items': 50000,
+    'batch_size': 1000,
+}
+
+QR_EXPORT_CONFIG = {
+    'itersize': 500,
+}
+
+# Per-user limit on saved codes, checked against a cached counter on the users row
+QR_QUOTA_CONFIG = {
+    'soft_limit': 10000,
+}
+
+# Background purge of deleted accounts and garbage collection of unreferenced assets
+QR_MAINTENANCE_CONFIG = {
+    'interval': 60,
+    'purge_chunk_size': 1000,
+    'gc_batch_size': 1000,
+    'gc_grace_seconds': 3600,
+}
+
+# Page sizes for /user/qr-codes
+QR_LIST_CONFIG = {
+    'default_limit': 50,
+    'max_limit': 200,
+}
+
+# Saved QR storage, 'binary' keeps the PNG bytes, 'render' keeps only the text and options and re-renders on demand
+QR_STORAGE_CONFIG = {
+    'mode': 'binary',
+}
+
+# Styled renders, templates are pre-rasterised per output size and kept for the busiest 'max_templates' styles.
+# Unknown style ids are remembered for 'missing_ttl' seconds.
+QR_STYLE_CONFIG = {
+    'max_templates': 256,
+    'max_missing': 4096,
+    'missing_ttl': 60,
+}
+
+style_templates = TemplateCache(
+    QR_STYLE_CONFIG['max_templates'],
+    max_missing=QR_STYLE_CONFIG['max_missing'],
+    missing_ttl=QR_STYLE_CONFIG['missing_ttl'],
+)
+
+# Batch rendering configuration, 'max_workers' of None uses one process per core
+QR_BATCH_CONFIG = {
+    'max_workers': None,
+    'max_items': 5000,
+    'chunksize': 16,
+}
+
+# Connection pool sizing, connections idle longer than 'health_check_interval' seconds are pinged before reuse
+DATABASE_POOL_CONFIG = {
+    'minconn': 1,
+    'maxconn': 10,
+    'acquire_timeout': 5.0,
+    'health_check_interval': 30.0,
+}
+
+db_pool = ConnectionPool(DATABASE_CONFIG, **DATABASE_POOL_CONFIG, cursor_factory=TimedCursor)
+
+def register_stats_gauge(name, help_text, component, stat, metric_type='gauge'):
+    """Expose one entry of component.stats() as a metric read at scrape time."""
+    registry.gauge(name, help_text, lambda: component.stats()[stat], metric_type)
+
+# Counters kept by the render cache and the pool, read at scrape time
+register_stats_gauge('qr_render_cache_hits_total', 'Render cache hits served from memory.', render_cache, 'hits', 'counter')
+register_stats_gauge('qr_render_cache_backend_hits_total', 'Render cache hits served from the shared backend.', render_cache, 'backend_hits', 'counter')
+register_stats_gauge('qr_render_cache_misses_total', 'Render cache misses.', render_cache, 'misses', 'counter')
+register_stats_gauge('qr_render_cache_evictions_total', 'Render cache evictions.', render_cache, 'evictions', 'counter')
+register_stats_gauge('qr_render_cache_bytes', 'Bytes held by the render cache.', render_cache, 'bytes')
+register_stats_gauge('db_pool_in_use', 'Database connections currently borrowed.', db_pool, 'in_use')
+register_stats_gauge('db_pool_max_size', 'Database pool size limit.', db_pool, 'max_size')
+register_stats_gauge('db_pool_timeouts_total', 'Borrows that gave up waiting for a connection.', db_pool, 'timeouts', 'counter')
+register_stats_gauge('db_pool_wait_seconds_total', 'Total time spent waiting for a free connection.', db_pool, 'wait_time_total', 'counter')
+
+# Password hashing, 'method' is passed to werkzeug and older hashes are upgraded to it on login
+PASSWORD_HASH_CONFIG = {
+    'method': 'scrypt:32768:8:1',
+    'max_workers': 4,
+    'max_pending': 16,
+    'timeout': 10.0,
+}
+
+password_hasher = PasswordHasher(**PASSWORD_HASH_CONFIG)
+
+def hashing_busy_response():
+    """429 returned when the password hashing pool is saturated."""
+    return jsonify({"error": "Too many authentication requests, please try again shortly."}), 429, {"Retry-After": "1"}
+
+storage_maintenance = StorageMaintenance(db_pool, **QR_MAINTENANCE_CONFIG)
+# Render pool workers re-import this script as __mp_main__ when it is run directly, only the server runs maintenance
+if __name__ != "__mp_main__":
+    storage_maintenance.start()
+
+def quota_exceeded_response():
+    return jsonify({"error": f"You can save at most {QR_QUOTA_CONFIG['soft_limit']} QR codes."}), 403
+
 def get_db_connection():
-    """Function to establish a database connection."""
-    conn = psycopg2.connect(**DATABASE_CONFIG, cursor_factory=RealDictCursor)
-    return conn
+    """Borrow a pooled database connection, use as `with get_db_connection() as conn:`."""
+    return db_pool.connection()
+
+QR_RESPONSE_MIMETYPES = ["application/json", "image/png", "image/svg+xml"]
+
+def load_style_template(style_id, conn=None):
+    """StyleTemplate for a registered style, or None. Built once per process and reused across renders.
+
+    Callers already holding a pooled connection pass it as conn, so the lookup never borrows a second one.
+    """
+    template = style_templates.get(style_id)
+    if template is None:
+        if style_templates.is_missing(style_id):
+            return None
+        with (nullcontext(conn) if conn is not None else get_db_connection()) as conn, conn.cursor() as cur:
+            cur.execute('SELECT definition, logo FROM qr_styles WHERE hash = %s', (style_id,))
+            row = cur.fetchone()
+        if row is None:
+            style_templates.set_missing(style_id)
+            return None
+        template = StyleTemplate(row['definition'], bytes(row['logo']) if row['logo'] is not None else None)
+        style_templates.set(style_id, template)
+    return template
+
+def resolve_style(options, conn=None):
+    """Return options and the template for options['style'], if any. Raises UnknownStyle for unknown styles.
+
+    A logo covers part of the code, so styles with one always render at error correction H.
+    """
+    if 'style' not in options:
+        return options, None
+    template = load_style_template(options['style'], conn)
+    if template is None:
+        raise UnknownStyle()
+    if template.has_logo:
+        options = {**options, 'error_correction': 'H'}
+    return options, template
+
+def unknown_style_response():
+    return jsonify({"error": "Unknown 'style'"}), 400
+
+def serve_qr(data, options, output_mimetype, template=None):
+    """Render (or reuse) a QR code and return it as JSON or as raw image bytes.
+
+    The render key doubles as a strong ETag, so repeat requests can skip encoding and transfer.
+    """
+    if output_mimetype != "application/json":
+        options = {**options, 'format': 'svg' if output_mimetype == "image/svg+xml" else 'png'}
+    key = render_key(data, options)
+    # Raw and JSON responses carry the same image in different bodies, so they need different validators
+    etag = key if output_mimetype == "application/json" else f"{key}.{options['format']}"
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        image_bytes = render_cache.get(key)
+        if image_bytes is None:
+            image_bytes = render_styled(data, options, template) if template else render_image(data, options)
+            render_cache.set(key, image_bytes)
+
+        if output_mimetype == "application/json":
+            with BASE64_SECONDS.time():
+                img_str = base64.b64encode(image_bytes).decode("utf-8")
+            response = jsonify({"qr_code": img_str, "mimetype": RENDER_MIMETYPES[options['format']]})
+        else:
+            # Raw bytes skip the base64 and JSON copies entirely
+            response = Response(image_bytes, mimetype=output_mimetype)
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            response.content_length = len(image_bytes)
+
+    response.set_etag(etag)
+    response.vary.add("Accept")
+    return response
 
 # Generate QR code
 @app.route("/generate-qr", methods=["POST"])
 def generate_qr():
-    """Endpoint to generate a QR code and optionally save it for logged-in users."""
+    """Endpoint to generate a QR code and optionally save it for logged-in users.
+
+    Returns base64 in JSON by default, or the raw image when the client asks for image/png or image/svg+xml.
+    """
     try:
         data = request.json.get("data")
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        # Generate QR code
-        img = qrcode.make(data)
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format="PNG")
-        img_str = base64.b64encode(img_buffer.getvalue()).decode("utf-8")
+        try:
+            options = normalize_render_options(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        options, template = resolve_style(options)
 
-        return jsonify({"qr_code": img_str}), 200
+        # Styled codes only exist as PNG
+        mimetypes = QR_RESPONSE_MIMETYPES[:2] if template else QR_RESPONSE_MIMETYPES
+        output_mimetype = request.accept_mimetypes.best_match(mimetypes, default="application/json")
+        return serve_qr(data, options, output_mimetype, template)
+    except UnknownStyle:
+        return unknown_style_response()
+    except DataOverflowError:
+        return jsonify({"error": "Data is too long for the requested version and error correction"}), 400
     except Exception as e:
         error_message = f"An error occurred: {str(e)}\n{traceback.format_exc()}"
         logging.error(error_message)
         return jsonify({"error": "An internal server error occurred. Please check the server logs."}), 500
 
+# Get a QR code image by URL
+@app.route("/qr", methods=["GET"])
+def get_qr():
+    """Endpoint serving a QR code image straight from query parameters, cacheable by a CDN or proxy.
+
+    e.g. /qr?data=hello&size=10&format=svg, where 'size' is the box size in pixels.
+    """
+    data = request.args.get("data")
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+
+    try:
+        options = normalize_render_options(render_options_from_args(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        options, template = resolve_style(options)
+
+        # An explicit format wins over the Accept header, which is awkward to control from an <img> tag
+        if "format" in request.args or template:
+            output_mimetype = RENDER_MIMETYPES[options['format']]
+        else:
+            output_mimetype = request.accept_mimetypes.best_match(["image/png", "image/svg+xml"], default="image/png")
+
+        return serve_qr(data, options, output_mimetype, template)
+    except UnknownStyle:
+        return unknown_style_response()
+    except DataOverflowError:
+        return jsonify({"error": "Data is too long for the requested version and error correction"}), 400
+    except Exception as e:
+        error_message = f"An error occurred: {str(e)}\n{traceback.format_exc()}"
+        logging.error(error_message)
+        return jsonify({"error": "An internal server error occurred. Please check the server logs."}), 500
+
+# Generate QR codes in bulk
+@app.route("/generate-qr/batch", methods=["POST"])
+def generate_qr_batch():
+    """Endpoint to render many QR codes at once, as a JSON array or a streamed ZIP."""
+    body = request.get_json(silent=True) or {}
+    items = body.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "'items' must be a non-empty list"}), 400
+    if len(items) > QR_BATCH_CONFIG['max_items']:
+        return jsonify({"error": f"At most {QR_BATCH_CONFIG['max_items']} items per batch"}), 400
+
+    output_format = body.get("format", "json")
+    if output_format not in ("json", "zip"):
+        return jsonify({"error": "'format' must be 'json' or 'zip'"}), 400
+
+    # Items are either plain strings or objects whose options override the batch-level ones.
+    # 'format' names the response format at the batch level, so only items can set the image format.
+    defaults = {name: value for name, value in body.items() if name not in ("items", "format")}
+    jobs = []
+    job_indexes = []
+    item_errors = {}
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"data": item}
+        if not isinstance(item, dict) or not item.get("data"):
+            item_errors[index] = "No data provided"
+            continue
+        try:
+            options = normalize_render_options({**defaults, **item})
+        except ValueError as e:
+            item_errors[index] = str(e)
+            continue
+        if 'style' in options:
+            item_errors[index] = "Styled QR codes cannot be rendered in a batch"
+            continue
+        jobs.append((item["data"], options))
+        job_indexes.append(index)
+
+    try:
+        rendered = render_many(jobs, render_cache, QR_BATCH_CONFIG['max_workers'], QR_BATCH_CONFIG['chunksize'])
+    except Exception as e:
+        logging.error(f"Batch render error: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": "An internal server error occurred. Please check the server logs."}), 500
+
+    def results():
+        """Merge rendered jobs back with the items rejected during validation, in request order."""
+        rendered_iter = iter(rendered)
+        job_set = set(job_indexes)
+        for index in range(len(items)):
+            if index in job_set:
+                yield next(rendered_iter)
+            else:
+                yield None, item_errors[index]
+
+    if output_format == "zip":
+        return Response(
+            stream_zip(results()),
+            mimetype="application/zip",
+            headers={"Content-Disposition": "attachment; filename=qr_codes.zip"},
+        )
+
+    try:
+        response = []
+        for index, (image_bytes, error) in enumerate(results()):
+            if error is not None:
+                response.append({"index": index, "error": error})
+            else:
+                response.append({"index": index, "qr_code": base64.b64encode(image_bytes).decode("utf-8")})
+        return jsonify(response), 200
+    except Exception as e:
+        logging.error(f"Batch render error: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": "An internal server error occurred. Please check the server logs."}), 500
+
+# Internal stats
+@app.route("/stats", methods=["GET"])
+def get_stats():
+    """Endpoint exposing render cache and database pool counters."""
+    return jsonify({"render_cache": render_cache.stats(), "db_pool": db_pool.stats()}), 200
+
+# Prometheus metrics
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Endpoint exposing all metrics in the Prometheus text exposition format."""
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
 # Register a new user
 @app.route('/register', methods=['POST'])
 def register_user():
@@ -104,30 +478,29 @@ def register_user():
     if password and len(password) < 6:
         return jsonify({"error": "Password must be at least 6 characters"}), 400
 
-    hashed_password = generate_password_hash(password)  # Encrypt the password
+    try:
+        hashed_password = password_hasher.hash(password)  # Encrypt the password
+    except HashingBusy:
+        return hashing_busy_response()
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # Check if user already exists
-        cur.execute('SELECT * FROM users WHERE email = %s', (email,))
-        existing_user = cur.fetchone()
-        if existing_user:
-            return jsonify({'error': 'User with this email already exists.'}), 400
-
-        cur.execute(
-            'INSERT INTO users (name, email, password) VALUES (%s, %s, %s) RETURNING id',
-            (name, email, hashed_password)
-        )
-        user_id = cur.fetchone()['id']
-        conn.commit()
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn, conn.cursor() as cur:
+            # Check if user already exists
+            cur.execute('SELECT 1 FROM users WHERE email = %s', (email,))
+            existing_user = cur.fetchone()
+            if existing_user:
+                return jsonify({'error': 'User with this email already exists.'}), 400
+
+            cur.execute(
+                'INSERT INTO users (name, email, password) VALUES (%s, %s, %s) RETURNING id',
+                (name, email, hashed_password)
+            )
+            user_id = cur.fetchone()['id']
+            conn.commit()
 
         # Set user session after registration
         session['user_id'] = user_id
-        print(f"Session set: {session}")  # Debug print to ensure session is set
+        logging.debug(f"Session set for user {user_id}")
 
         # Return user data
         return jsonify({
@@ -138,6 +511,20 @@ def register_user():
         logging.error(f"Registration error: {str(e)}")
         return jsonify({'error': 'An error occurred during registration.'}), 500
 
+def rehash_password(user_id, old_hash, password):
+    """Store a fresh hash for a user whose password was just verified, failures only get logged."""
+    try:
+        new_hash = password_hasher.hash(password)
+        with get_db_connection() as conn, conn.cursor() as cur:
+            # Compare against the old hash so a concurrent password change is never overwritten
+            cur.execute(
+                'UPDATE users SET password = %s WHERE id = %s AND password = %s',
+                (new_hash, user_id, old_hash)
+            )
+            conn.commit()
+    except Exception as e:
+        logging.error(f"Password rehash error: {str(e)}")
+
 # User login
 @app.route('/login', methods=['POST'])
 def login_user():
@@ -150,21 +537,24 @@ def login_user():
         return jsonify({'error': 'Email and password are required.'}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM users WHERE email = %s', (email,))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-
-        if user and check_password_hash(user['password'], password):
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('SELECT id, name, email, password FROM users WHERE email = %s', (email,))
+            user = cur.fetchone()
+
+        if user and password_hasher.verify(user['password'], password):
+            # Transparently upgrade hashes made with an older method or cost
+            if password_hasher.needs_rehash(user['password']):
+                rehash_password(user['id'], user['password'], password)
+
             session['user_id'] = user['id']
-            print(f"Session after login: {session}")  # Debug print to check session
+            logging.debug(f"Session set for user {user['id']}")
             session.permanent = True  # Ensure the session persists
             session.modified = True   # Mark the session as modified
             return jsonify({'message': 'Login successful!', 'user': {'id': user['id'], 'name': user['name'], 'email': user['email']}}), 200
         else:
             return jsonify({'error': 'Invalid credentials'}), 401
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
         logging.error(f"Login error: {str(e)}")
         return jsonify({'error': 'An error occurred during login.'}), 500
@@ -179,20 +569,15 @@ def logout_user():
 # Get user profile
 @app.route('/user/profile', methods=['GET'])
 def get_user_profile():
-    print(f"Session data on /user/profile request: {session}")  # Debugging: Check the session
     """Endpoint to get the logged-in user's profile."""
     user_id = session.get("user_id")
     if not user_id:
-        print(f"failed to get user_id")
         return jsonify({"error": "User not logged in"}), 403
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT id, name, email FROM users WHERE id = %s', (user_id,))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('SELECT id, name, email FROM users WHERE id = %s AND deleted_at IS NULL', (user_id,))
+            user = cur.fetchone()
 
         if user:
             return jsonify(user), 200
@@ -202,47 +587,195 @@ def get_user_profile():
         logging.error(f"Profile fetch error: {str(e)}")
         return jsonify({"error": "An error occurred while fetching profile."}), 500
 
+def encode_page_cursor(timestamp, id):
+    """Opaque keyset token for the row a page ended on."""
+    token = json.dumps([timestamp.isoformat(), id]).encode('utf-8')
+    return base64.urlsafe_b64encode(token).decode('ascii')
+
+def decode_page_cursor(token):
+    """Inverse of encode_page_cursor. Raises ValueError on a malformed token."""
+    try:
+        timestamp, id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return datetime.fromisoformat(timestamp), int(id)
+    except (binascii.Error, TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+# Sessions of a deleted account can outlive the deletion, so code queries also check the owner is still live
+LIVE_OWNER = "EXISTS (SELECT 1 FROM users u WHERE u.id = {table}.user_id AND u.deleted_at IS NULL)"
+
 # Get QR codes for the logged-in user
 @app.route("/user/qr-codes", methods=["GET"])
 def get_user_qr_codes():
-    """Endpoint to get all QR codes generated by the logged-in user."""
+    """Endpoint to get one page of the logged-in user's QR codes, newest first.
+
+    The token for the next page is returned in the X-Next-Cursor header.
+    """
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"error": "User not logged in"}), 403
 
+    limit = request.args.get("limit", QR_LIST_CONFIG['default_limit'], type=int)
+    if not 1 <= limit <= QR_LIST_CONFIG['max_limit']:
+        return jsonify({"error": f"'limit' must be between 1 and {QR_LIST_CONFIG['max_limit']}"}), 400
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            after_timestamp, after_id = decode_page_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        keyset_clause = "AND (timestamp, id) < (%s, %s)"
+        params = (user_id, after_timestamp, after_id, limit + 1)
+    else:
+        keyset_clause = ""
+        params = (user_id, limit + 1)
+
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(
-            "SELECT id, qr_text, qr_image, timestamp FROM qr_codes WHERE user_id = %s ORDER BY timestamp DESC",
-            (user_id,)
-        )
-        qr_codes = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        # Process qr_codes to convert 'qr_image' from memoryview to string
-        for qr_code in qr_codes:
-            # Convert 'qr_image' from memoryview to string
-            qr_image_memoryview = qr_code['qr_image']
-            if isinstance(qr_image_memoryview, memoryview):
-                qr_image_bytes = qr_image_memoryview.tobytes()
-                qr_image_str = qr_image_bytes.decode('utf-8')
-                qr_code['qr_image'] = qr_image_str
-
-            # Convert 'timestamp' to ISO format string with timezone info
-            timestamp = qr_code['timestamp']
-            if isinstance(timestamp, datetime):
-                # Ensure the timestamp is timezone-aware
-                if timestamp.tzinfo is None:
-                    timestamp = timestamp.replace(tzinfo=timezone.utc)
-                qr_code['timestamp'] = timestamp.isoformat()
-
-        return jsonify(qr_codes), 200
+        # Images are served separately by get_user_qr_code_image, so only metadata is read here.
+        # A named (server-side) cursor streams the page instead of materialising it with fetchall().
+        qr_codes = []
+        next_cursor = None
+        with get_db_connection() as conn, conn.cursor(name="user_qr_codes_page") as cur:
+            cur.itersize = limit + 1
+            cur.execute(
+                f"""
+                SELECT id, qr_text, timestamp FROM qr_codes
+                WHERE user_id = %s AND {LIVE_OWNER.format(table='qr_codes')} {keyset_clause}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT %s
+                """,
+                params
+            )
+            for qr_code in cur:
+                # The extra row only tells us whether another page exists
+                if len(qr_codes) == limit:
+                    next_cursor = encode_page_cursor(last_timestamp, qr_codes[-1]['id'])
+                    break
+
+                timestamp = last_timestamp = qr_code['timestamp']
+                qr_code['image_url'] = f"/user/qr-codes/{qr_code['id']}/image"
+
+                # Convert 'timestamp' to ISO format string with timezone info
+                if isinstance(timestamp, datetime):
+                    qr_code['timestamp'] = isoformat_utc(timestamp)
+                qr_codes.append(qr_code)
+
+        response = jsonify(qr_codes)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
     except Exception as e:
         logging.error(f"Fetching QR codes error: {str(e)}")
         return jsonify({"error": "An error occurred while fetching QR codes."}), 500
-    
+
+# Saved codes with their image, which lives inline on older rows and in qr_assets since deduplication.
+# Pass qr_image=SAVED_QR_IMAGE, or qr_image='NULL' when the image bytes are not needed.
+SAVED_QR_IMAGE = "COALESCE(q.qr_image, a.qr_image)"
+SAVED_QR_COLUMNS = """
+    q.id, q.qr_text, q.timestamp,
+    {qr_image} AS qr_image,
+    COALESCE(q.render_options, a.render_options) AS render_options
+    FROM qr_codes q LEFT JOIN qr_assets a ON a.hash = q.asset_hash
+"""
+
+def render_cached(data, options, template=None):
+    """Image bytes for data and options, from the render cache when possible."""
+    key = render_key(data, options)
+    image_bytes = render_cache.get(key)
+    if image_bytes is None:
+        image_bytes = render_styled(data, options, template) if template else render_image(data, options)
+        render_cache.set(key, image_bytes)
+    return image_bytes
+
+def saved_qr_png(qr_code, conn=None):
+    """PNG bytes for a qr_codes row, re-rendering rows saved in render-only mode.
+
+    Pass the connection the row was read from as conn when it is still held, styles are then loaded through it.
+    """
+    if qr_code['qr_image'] is not None:
+        return stored_image_to_png(qr_code['qr_image'])
+    # Render-only storage: re-render deterministically from the saved options
+    options, template = resolve_style({**normalize_render_options(qr_code['render_options']), 'format': 'png'}, conn)
+    return render_cached(qr_code['qr_text'], options, template)
+
+# Get the image of a saved QR code
+@app.route("/user/qr-codes/<int:id>/image", methods=["GET"])
+def get_user_qr_code_image(id):
+    """Endpoint to serve a saved QR code as a PNG image."""
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 403
+
+    # A saved code never changes, so its id is a stable validator
+    etag = f"qr-{id}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    try:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"SELECT {SAVED_QR_COLUMNS.format(qr_image=SAVED_QR_IMAGE)} WHERE q.id = %s AND q.user_id = %s AND {LIVE_OWNER.format(table='q')}",
+                (id, user_id)
+            )
+            qr_code = cur.fetchone()
+
+        if not qr_code:
+            return jsonify({"error": "QR code not found or does not belong to the user"}), 404
+
+        response = Response(saved_qr_png(qr_code), mimetype="image/png")
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
+    except Exception as e:
+        logging.error(f"Fetching QR code image error: {str(e)}")
+        return jsonify({"error": "An error occurred while fetching the QR code image."}), 500
+
+# Register a QR style
+@app.route('/user/styles', methods=['POST'])
+def register_style():
+    """Endpoint to register colours, a module shape and an optional base64 PNG logo as a reusable style.
+
+    Returns the style id to pass as the 'style' render option. Registering the same style again returns the same id.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 403
+
+    data = request.get_json(silent=True) or {}
+    logo_bytes = None
+    if data.get('logo'):
+        try:
+            logo_bytes = base64.b64decode(data['logo'], validate=True)
+        except (binascii.Error, TypeError):
+            return jsonify({"error": "'logo' must be a base64-encoded PNG"}), 400
+
+    try:
+        style = normalize_style(data, logo_bytes)
+        # Decoding the logo here rejects broken or oversized images before they are stored
+        template = StyleTemplate(style, logo_bytes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        style_id = style_hash(style, logo_bytes)
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO qr_styles (hash, definition, logo, created_by) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (hash) DO NOTHING
+                """,
+                (style_id, Json(style), logo_bytes, user_id)
+            )
+            conn.commit()
+        style_templates.set(style_id, template)
+
+        return jsonify({"style": style_id, **style}), 201
+    except Exception as e:
+        logging.error(f"Error registering style: {str(e)}")
+        return jsonify({"error": "An error occurred while registering the style."}), 500
+
 # Save QR code
 @app.route('/user/save-qr', methods=['POST'])
 def save_qr_code():
@@ -253,29 +786,189 @@ def save_qr_code():
 
     data = request.get_json()
     inputText = data.get('inputText')
-    qrImage = data.get('qrImage')
-    if not inputText or not qrImage:
-        return jsonify({"error": "Missing inputText or qrImage"}), 400
+    if not inputText:
+        return jsonify({"error": "Missing inputText"}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO qr_codes (user_id, qr_text, qr_image, timestamp)
-            VALUES (%s, %s, %s, %s)
-            """,
-            (user_id, inputText, qrImage, datetime.now(timezone.utc).replace(tzinfo=None)),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        options = {**normalize_render_options(data.get('renderOptions')), 'format': 'png'}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        options, template = resolve_style(options)
+        # Assets are shared between users, so their image is always rendered here, never taken from the
+        # client. Any qrImage in the request is ignored.
+        png_bytes = None if QR_STORAGE_CONFIG['mode'] == 'render' else render_cached(inputText, options, template)
+        # Identical text and options share one stored asset, the user's row only references it
+        asset_hash = render_key(inputText, options)
+        with get_db_connection() as conn, conn.cursor() as cur:
+            reserve_quota(cur, user_id, 1, QR_QUOTA_CONFIG['soft_limit'])
+            acquire_assets(cur, {asset_hash: (inputText, png_bytes, options, 1)})
+            cur.execute(
+                """
+                INSERT INTO qr_codes (user_id, qr_text, render_options, asset_hash, timestamp)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (user_id, inputText, Json(options), asset_hash, datetime.now(timezone.utc).replace(tzinfo=None)),
+            )
+            conn.commit()
 
         return jsonify({"message": "QR code saved successfully."}), 201
+    except UnknownStyle:
+        return unknown_style_response()
+    except QuotaExceeded:
+        return quota_exceeded_response()
+    except DataOverflowError:
+        return jsonify({"error": "Data is too long for the requested version and error correction"}), 400
     except Exception as e:
         logging.error(f"Error saving QR code: {str(e)}")
         return jsonify({"error": "An error occurred while saving the QR code."}), 500
 
+# Import QR codes in bulk
+@app.route("/user/qr-codes/import", methods=["POST"])
+def import_qr_codes():
+    """Endpoint to save many QR codes from a CSV or NDJSON file of texts.
+
+    Texts are read and rendered in batches, each batch's images stored as unreferenced assets in a short
+    transaction of its own. Every reference and row is then written in one final transaction, so an import
+    is all or nothing and shared assets are only locked briefly, in a single sorted pass.
+    Render options can be passed as query parameters, as for /qr.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 403
+
+    # Accept either a multipart upload in 'file' or the raw request body
+    upload = request.files.get("file")
+    if upload:
+        stream = upload.stream
+        import_format = request.args.get("format") or detect_import_format(upload.filename, upload.mimetype)
+    else:
+        stream = request.stream
+        import_format = request.args.get("format") or detect_import_format(None, request.mimetype)
+    if import_format not in IMPORT_FORMATS:
+        return jsonify({"error": "'format' must be 'csv' or 'ndjson'"}), 400
+
+    try:
+        # 'format' names the file format here, saved codes are always PNG
+        render_args = {name: value for name, value in request.args.items() if name != "format"}
+        options = {**normalize_render_options(render_options_from_args(render_args)), 'format': 'png'}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if 'style' in options:
+        return jsonify({"error": "Styled QR codes cannot be imported"}), 400
+
+    render_only = QR_STORAGE_CONFIG['mode'] == 'render'
+    timestamp = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = []
+    references = {}
+    seen = 0
+    errors = []
+
+    try:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            for batch in batched(read_import_texts(stream, import_format), QR_IMPORT_CONFIG['batch_size']):
+                seen += len(batch)
+                if seen > QR_IMPORT_CONFIG['max_items']:
+                    return jsonify({"error": f"At most {QR_IMPORT_CONFIG['max_items']} codes per import"}), 400
+
+                valid = [(line, text) for line, text, error in batch if error is None]
+                errors.extend({"line": line, "error": error} for line, _, error in batch if error is not None)
+
+                if render_only:
+                    images = [(None, None)] * len(valid)
+                else:
+                    jobs = [(text, options) for _, text in valid]
+                    images = render_many(jobs, render_cache, QR_BATCH_CONFIG['max_workers'], QR_BATCH_CONFIG['chunksize'])
+
+                assets = {}
+                for (line, text), (png_bytes, error) in zip(valid, images):
+                    if error is not None:
+                        errors.append({"line": line, "error": error})
+                        continue
+                    asset_hash = render_key(text, options)
+                    count = references[asset_hash][3] + 1 if asset_hash in references else 1
+                    references[asset_hash] = (text, None, options, count)
+                    assets[asset_hash] = (text, png_bytes, options)
+                    rows.append((user_id, text, Json(options), asset_hash, timestamp))
+                if assets and not render_only:
+                    store_asset_images(cur, assets)
+                    conn.commit()
+
+            if rows:
+                reserve_quota(cur, user_id, len(rows), QR_QUOTA_CONFIG['soft_limit'])
+                # Images are already stored, taking every reference in one sorted statement keeps lock order
+                # stable against concurrent imports and saves
+                acquire_assets(cur, references)
+                execute_values(
+                    cur,
+                    "INSERT INTO qr_codes (user_id, qr_text, render_options, asset_hash, timestamp) VALUES %s",
+                    rows,
+                    page_size=QR_IMPORT_CONFIG['batch_size'],
+                )
+            conn.commit()
+
+        return jsonify({"imported": len(rows), "errors": errors}), 201
+    except QuotaExceeded:
+        return quota_exceeded_response()
+    except (UnicodeDecodeError, csv.Error):
+        return jsonify({"error": "The file must be UTF-8 encoded CSV or NDJSON"}), 400
+    except Exception as e:
+        logging.error(f"Importing QR codes error: {str(e)}")
+        return jsonify({"error": "An error occurred while importing QR codes."}), 500
+
+# Export QR codes in bulk
+@app.route("/user/qr-codes/export", methods=["GET"])
+def export_qr_codes():
+    """Endpoint to stream all of the logged-in user's QR codes as NDJSON or as a ZIP of PNGs.
+
+    Rows come from a server-side cursor, so memory use stays flat however many codes the user has.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 403
+
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in ("ndjson", "zip"):
+        return jsonify({"error": "'format' must be 'ndjson' or 'zip'"}), 400
+
+    # NDJSON lines carry no image, so only ZIP exports read the image bytes out of Postgres
+    columns = SAVED_QR_COLUMNS.format(qr_image=SAVED_QR_IMAGE if export_format == "zip" else "NULL")
+
+    def rows():
+        # The connection is held for as long as the client keeps reading
+        try:
+            with get_db_connection() as conn, conn.cursor(name="user_qr_codes_export") as cur:
+                cur.itersize = QR_EXPORT_CONFIG['itersize']
+                cur.execute(
+                    f"""
+                    SELECT {columns}
+                    WHERE q.user_id = %s AND {LIVE_OWNER.format(table='q')}
+                    ORDER BY q.timestamp DESC, q.id DESC
+                    """,
+                    (user_id,)
+                )
+                # The connection goes along with each row, so re-renders load styles through it
+                # instead of borrowing a second pooled connection while this cursor is open
+                for qr_code in cur:
+                    yield conn, qr_code
+        except Exception as e:
+            logging.error(f"Exporting QR codes error: {str(e)}")
+            raise
+
+    if export_format == "zip":
+        entries = ((f"qr_{qr_code['id']}.png", saved_qr_png(qr_code, conn)) for conn, qr_code in rows())
+        return Response(
+            stream_zip_entries(entries),
+            mimetype="application/zip",
+            headers={"Content-Disposition": "attachment; filename=qr_codes.zip"},
+        )
+    return Response(
+        (ndjson_record(qr_code) for _, qr_code in rows()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=qr_codes.ndjson"},
+    )
+
 # Delete a QR code
 @app.route('/user/delete-qr/<int:id>', methods=['DELETE'])
 def delete_qr_code(id):
@@ -285,16 +978,20 @@ def delete_qr_code(id):
         return jsonify({"error": "User not logged in"}), 403
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        # Ensure the QR code belongs to the logged-in user before deleting
-        cur.execute('DELETE FROM qr_codes WHERE id = %s AND user_id = %s RETURNING id', (id, user_id))
-        deleted_id = cur.fetchone()
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        if deleted_id:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            # Ensure the QR code belongs to the logged-in user before deleting
+            cur.execute(
+                f"DELETE FROM qr_codes WHERE id = %s AND user_id = %s AND {LIVE_OWNER.format(table='qr_codes')} RETURNING id, asset_hash",
+                (id, user_id)
+            )
+            deleted = cur.fetchone()
+            if deleted:
+                release_quota(cur, user_id, 1)
+                if deleted['asset_hash']:
+                    release_assets(cur, {deleted['asset_hash']: 1})
+            conn.commit()
+
+        if deleted:
             return jsonify({"message": "QR code deleted successfully"}), 200
         else:
             return jsonify({"error": "QR code not found or does not belong to the user"}), 404
@@ -327,27 +1024,30 @@ def update_profile():
         return jsonify({"error": "Name, email, and current password are required."}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('SELECT password FROM users WHERE id = %s AND deleted_at IS NULL', (user_id,))
+            user = cur.fetchone()
 
-        # Verify the current password
-        cur.execute('SELECT password FROM users WHERE id = %s', (user_id,))
-        user = cur.fetchone()
-        if not check_password_hash(user['password'], current_password):
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        # Hash outside the connection block so slow hashes never hold a pooled connection
+        if not password_hasher.verify(user['password'], current_password):
             return jsonify({"error": "Incorrect current password"}), 403
+        hashed_password = password_hasher.hash(new_password) if new_password else None
+
+        with get_db_connection() as conn, conn.cursor() as cur:
+            # Update user info
+            # A deleted account keeps its 'deleted:' email until the purge, even if another session is still open
+            cur.execute('UPDATE users SET name = %s, email = %s WHERE id = %s AND deleted_at IS NULL', (name, email, user_id))
 
-        # Update user info
-        cur.execute('UPDATE users SET name = %s, email = %s WHERE id = %s', (name, email, user_id))
-        
-        if new_password:
-            hashed_password = generate_password_hash(new_password)
-            cur.execute('UPDATE users SET password = %s WHERE id = %s', (hashed_password, user_id))
+            if hashed_password:
+                cur.execute('UPDATE users SET password = %s WHERE id = %s AND deleted_at IS NULL', (hashed_password, user_id))
 
-        conn.commit()
-        cur.close()
-        conn.close()
+            conn.commit()
 
         return jsonify({"message": "Profile updated successfully!"}), 200
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -365,26 +1065,33 @@ def delete_account():
         return jsonify({"error": "Password is required"}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # Verify the user's password
-        cur.execute('SELECT password FROM users WHERE id = %s', (user_id,))
-        user = cur.fetchone()
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('SELECT password FROM users WHERE id = %s AND deleted_at IS NULL', (user_id,))
+            user = cur.fetchone()
 
-        if not check_password_hash(user['password'], password):
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        # Verify the user's password without holding a pooled connection
+        if not password_hasher.verify(user['password'], password):
             return jsonify({"error": "Incorrect password"}), 403
 
-        # Delete the user and all associated QR codes
-        cur.execute('DELETE FROM qr_codes WHERE user_id = %s', (user_id,))
-        cur.execute('DELETE FROM users WHERE id = %s', (user_id,))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn, conn.cursor() as cur:
+            # Mark the account deleted and free its email; its QR codes are purged in chunks in the background
+            cur.execute(
+                """
+                UPDATE users SET deleted_at = now(), email = 'deleted:' || id || ':' || email
+                WHERE id = %s AND deleted_at IS NULL
+                """,
+                (user_id,)
+            )
+
+            conn.commit()
 
+        storage_maintenance.wake()
         session.pop('user_id', None)  # Remove session
         return jsonify({"message": "Account deleted successfully!"}), 200
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,51 @@
+# bench_encode.py
+"""Microbenchmarks for the stages of a plain /generate-qr render: qrcode.make, PNG save and base64.
+
+Run from the backend folder: python benchmarks/bench_encode.py --output results/encode.json
+"""
+import io
+import os
+import sys
+import base64
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode
+from common import timed, summarize, write_results, print_results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10,100,500,1000,2000', help='comma-separated payload sizes in bytes')
+    parser.add_argument('--versions', default='1,10,20,40', help='comma-separated pinned QR versions')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='write JSON results to this path')
+    args = parser.parse_args()
+
+    results = {}
+    for size in (int(n) for n in args.sizes.split(',')):
+        data = 'x' * size
+        img = qrcode.make(data)
+        img_buffer = io.BytesIO()
+        img.save(img_buffer, format="PNG")
+        png_bytes = img_buffer.getvalue()
+
+        results[f"make/payload={size}"] = summarize(timed(lambda: qrcode.make(data), args.repeat))
+        results[f"save_png/payload={size}"] = summarize(timed(lambda: img.save(io.BytesIO(), format="PNG"), args.repeat))
+        results[f"base64/payload={size}"] = summarize(timed(lambda: base64.b64encode(png_bytes).decode("utf-8"), args.repeat))
+
+    # Pinned versions isolate the matrix size from the payload size
+    for version in (int(v) for v in args.versions.split(',')):
+        def make_pinned():
+            qr = qrcode.QRCode(version=version)
+            qr.add_data('QR')
+            qr.make(fit=False)
+            return qr.make_image()
+        results[f"make/version={version}"] = summarize(timed(make_pinned, args.repeat))
+
+    print_results(results)
+    if args.output:
+        write_results(args.output, 'encode', results)
+
+if __name__ == "__main__":
+    main()
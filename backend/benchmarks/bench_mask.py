@@ -0,0 +1,60 @@
+# bench_mask.py
+"""Compare mask selection of the default and 'fast' encoding profiles.
+
+Checks that both profiles produce identical module matrices, then reports the encode time of each.
+Run from the backend folder: python benchmarks/bench_mask.py
+"""
+import os
+import sys
+import time
+import random
+import string
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode
+from qr_fast import FastMaskQRCode
+
+def encode(qr_class, data, error_correction):
+    qr = qr_class(error_correction=error_correction)
+    qr.add_data(data)
+    started = time.perf_counter()
+    qr.make(fit=True)
+    return qr, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--samples', type=int, default=50, help='payloads per length')
+    parser.add_argument('--lengths', default='10,100,500,1000', help='comma-separated payload lengths')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'length':>6} {'version':>7} {'default ms':>11} {'fast ms':>8} {'speedup':>8}")
+    for length in (int(n) for n in args.lengths.split(',')):
+        default_total = fast_total = 0.0
+        versions = set()
+        for _ in range(args.samples):
+            data = ''.join(rng.choice(string.printable) for _ in range(length))
+            error_correction = rng.choice([
+                qrcode.constants.ERROR_CORRECT_L,
+                qrcode.constants.ERROR_CORRECT_M,
+                qrcode.constants.ERROR_CORRECT_Q,
+                qrcode.constants.ERROR_CORRECT_H,
+            ])
+            expected, default_time = encode(qrcode.QRCode, data, error_correction)
+            actual, fast_time = encode(FastMaskQRCode, data, error_correction)
+            if actual.modules != expected.modules:
+                sys.exit(f"Mismatch for payload of length {length}: {data!r}")
+            default_total += default_time
+            fast_total += fast_time
+            versions.add(expected.version)
+
+        version_range = f"{min(versions)}-{max(versions)}"
+        default_ms = default_total / args.samples * 1000
+        fast_ms = fast_total / args.samples * 1000
+        print(f"{length:>6} {version_range:>7} {default_ms:>11.2f} {fast_ms:>8.2f} {default_ms / fast_ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
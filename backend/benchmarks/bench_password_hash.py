@@ -0,0 +1,45 @@
+# bench_password_hash.py
+"""Microbenchmark for password verification throughput through PasswordHasher.
+
+Run from the backend folder: python benchmarks/bench_password_hash.py
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher
+
+def bench(method, workers, logins):
+    """Verify `logins` passwords from `workers` client threads and return logins per second."""
+    hasher = PasswordHasher(method=method, max_workers=workers, max_pending=logins)
+    pwhash = hasher.hash('correct horse battery staple')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as clients:
+        results = list(clients.map(lambda _: hasher.verify(pwhash, 'correct horse battery staple'), range(logins)))
+    elapsed = time.perf_counter() - started
+
+    assert all(results)
+    return logins / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--method', default='scrypt:32768:8:1', help='werkzeug hash method and cost')
+    parser.add_argument('--logins', type=int, default=64, help='verifications per run')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count(), help='largest pool size to try')
+    args = parser.parse_args()
+
+    print(f"method={args.method} logins={args.logins}")
+    print(f"{'workers':>8} {'logins/s':>10} {'logins/s/core':>14}")
+    workers = 1
+    while workers <= args.max_workers:
+        rate = bench(args.method, workers, args.logins)
+        print(f"{workers:>8} {rate:>10.1f} {rate / workers:>14.1f}")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# bench_render.py
+"""Benchmark the PIL and NumPy render engines on prebuilt QR matrices.
+
+Matrix encoding is done once per version, so the timings only cover drawing and PNG encoding.
+Run from the backend folder: python benchmarks/bench_render.py
+"""
+import io
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode
+import qr_fast
+
+def render_pil(qr):
+    img_buffer = io.BytesIO()
+    qr.make_image().save(img_buffer, format="PNG")
+    return img_buffer.getvalue()
+
+def render_numpy(qr):
+    return qr_fast.png_from_modules(qr.modules, qr.box_size, qr.border)
+
+def best_time(fn, qr, repeat):
+    """Fastest of `repeat` runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(qr)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--versions', default='1,5,10,20,30,40', help='comma-separated QR versions')
+    parser.add_argument('--box-sizes', default='1,4,10', help='comma-separated box sizes')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'version':>7} {'box':>4} {'pil ms':>9} {'numpy ms':>9} {'speedup':>8}")
+    for version in (int(v) for v in args.versions.split(',')):
+        for box_size in (int(b) for b in args.box_sizes.split(',')):
+            qr = qrcode.QRCode(version=version, box_size=box_size)
+            qr.add_data('QR')
+            qr.make(fit=False)
+            pil_ms = best_time(render_pil, qr, args.repeat)
+            numpy_ms = best_time(render_numpy, qr, args.repeat)
+            print(f"{version:>7} {box_size:>4} {pil_ms:>9.2f} {numpy_ms:>9.2f} {pil_ms / numpy_ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
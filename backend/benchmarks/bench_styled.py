@@ -0,0 +1,75 @@
+# bench_styled.py
+"""Compare styled renders from a precomputed template with plain renders and qrcode's StyledPilImage.
+
+Matrix encoding is done once per version, so the timings only cover drawing and PNG encoding.
+Run from the backend folder: python benchmarks/bench_styled.py
+"""
+import io
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode
+from PIL import Image
+from qrcode.image.styledpil import StyledPilImage
+from qrcode.image.styles.moduledrawers.pil import CircleModuleDrawer, GappedSquareModuleDrawer, RoundedModuleDrawer, SquareModuleDrawer
+import qr_fast
+from qr_styles import MODULE_SHAPES, StyleTemplate, normalize_style
+
+def make_logo():
+    img_buffer = io.BytesIO()
+    Image.new('RGBA', (128, 128), (200, 30, 60, 255)).save(img_buffer, format="PNG")
+    return img_buffer.getvalue()
+
+def best_time(fn, repeat):
+    """Fastest of `repeat` runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--versions', default='2,5,10,20', help='comma-separated QR versions')
+    parser.add_argument('--box-size', type=int, default=10)
+    parser.add_argument('--shape', default='circle', choices=MODULE_SHAPES)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    logo = make_logo()
+    template = StyleTemplate(normalize_style({'module_shape': args.shape, 'foreground': '#1a2b3c'}, logo), logo)
+    logo_image = Image.open(io.BytesIO(logo))
+
+    # Closest StyledPilImage drawer for each module shape
+    drawer = {
+        'square': SquareModuleDrawer,
+        'gapped': GappedSquareModuleDrawer,
+        'rounded': RoundedModuleDrawer,
+        'circle': CircleModuleDrawer,
+    }[args.shape]
+
+    def render_styledpil(qr):
+        img = qr.make_image(image_factory=StyledPilImage, module_drawer=drawer(), embeded_image=logo_image)
+        img_buffer = io.BytesIO()
+        img.save(img_buffer, format="PNG")
+        return img_buffer.getvalue()
+
+    print(f"{'version':>7} {'plain ms':>9} {'styled ms':>10} {'styledpil ms':>13} {'vs plain':>9}")
+    for version in (int(v) for v in args.versions.split(',')):
+        qr = qrcode.QRCode(version=version, box_size=args.box_size, error_correction=qrcode.constants.ERROR_CORRECT_H)
+        qr.add_data('QR')
+        qr.make(fit=False)
+        plain_ms = best_time(lambda: qr_fast.png_from_modules(qr.modules, qr.box_size, qr.border), args.repeat)
+        # The first call pre-rasterises the layers for this geometry, as the first request would
+        template.render_png(qr.modules, qr.box_size, qr.border)
+        styled_ms = best_time(lambda: template.render_png(qr.modules, qr.box_size, qr.border), args.repeat)
+        styledpil_ms = best_time(lambda: render_styledpil(qr), args.repeat)
+        print(f"{version:>7} {plain_ms:>9.2f} {styled_ms:>10.2f} {styledpil_ms:>13.2f} {styled_ms / plain_ms:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
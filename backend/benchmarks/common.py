@@ -0,0 +1,54 @@
+# common.py
+"""Shared helpers for the benchmark scripts: timing, percentile summaries and JSON results."""
+import json
+import time
+import platform
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+def summarize(samples, elapsed=None):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ordered = sorted(samples)
+    summary = {
+        'count': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p90_ms': percentile(ordered, 0.90) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': ordered[-1] * 1000 if ordered else 0.0,
+    }
+    if elapsed:
+        summary['throughput_per_s'] = len(ordered) / elapsed
+    return summary
+
+def timed(fn, repeat):
+    """Call fn repeat times and return the list of durations in seconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def write_results(path, suite, results):
+    """Write machine-readable results, with enough context to tell runs apart."""
+    document = {
+        'suite': suite,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def print_results(results):
+    print(f"{'benchmark':<40} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    for name, summary in results.items():
+        print(f"{name:<40} {summary['count']:>6} {summary['p50_ms']:>9.3f} {summary['p90_ms']:>9.3f} {summary['p99_ms']:>9.3f}")
@@ -0,0 +1,41 @@
+# compare.py
+"""Compare two benchmark result files and fail if any benchmark regressed.
+
+Run: python benchmarks/compare.py baseline.json current.json --metric p90_ms --threshold 0.10
+"""
+import sys
+import json
+import argparse
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--metric', default='p50_ms', help='summary field to compare')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    print(f"{'benchmark':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(baseline.keys() & current.keys()):
+        before = baseline[name][args.metric]
+        after = current[name][args.metric]
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{name:<40} {before:>10.3f} {after:>10.3f} {change:>+7.1%}{flag}")
+
+    for name in sorted(baseline.keys() - current.keys()):
+        print(f"{name:<40} missing from {args.current}")
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# load_test.py
+"""End-to-end load scenarios against the Flask app through its test client.
+
+Without --dsn only the database-free endpoints are exercised. With --dsn pointing at a disposable
+Postgres database, migrations are applied there and register, login, generate, save, list and
+delete run as one user journey per virtual client.
+
+Run from the backend folder:
+    python benchmarks/load_test.py --clients 8 --iterations 50 --output results/load.json
+    python benchmarks/load_test.py --dsn postgresql://postgres@localhost/qr_final_bench
+"""
+import os
+import sys
+import time
+import uuid
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as backend
+from db import ConnectionPool, TimedCursor
+from migrate import run_migrations
+from common import summarize, write_results, print_results
+
+def timed_request(samples, name, call, expected_status):
+    started = time.perf_counter()
+    response = call()
+    samples[name].append(time.perf_counter() - started)
+    if response.status_code != expected_status:
+        samples[f"{name}/unexpected_status"].append(0.0)
+    return response
+
+def stateless_journey(client, index, samples):
+    """Generate single, batch and GET /qr renders, half of them repeats that hit the render cache."""
+    data = f"https://example.com/items/{index % 50}"
+    timed_request(samples, 'generate', lambda: client.post('/generate-qr', json={'data': data}), 200)
+    timed_request(samples, 'generate_raw', lambda: client.post('/generate-qr', json={'data': data}, headers={'Accept': 'image/png'}), 200)
+    timed_request(samples, 'qr_get', lambda: client.get('/qr', query_string={'data': data, 'size': 4}), 200)
+    batch = {'items': [f"{data}/{n}" for n in range(10)]}
+    timed_request(samples, 'generate_batch_10', lambda: client.post('/generate-qr/batch', json=batch), 200)
+
+def user_journey(client, index, samples):
+    """Register, log in, generate and save a few codes, list them and delete them."""
+    email = f"bench-{uuid.uuid4().hex}@example.com"
+    password = 'bench-password'
+    timed_request(samples, 'register', lambda: client.post('/register', json={'name': 'Bench', 'email': email, 'password': password}), 201)
+    timed_request(samples, 'login', lambda: client.post('/login', json={'email': email, 'password': password}), 200)
+    for n in range(3):
+        text = f"https://example.com/{index}/{n}"
+        qr_code = timed_request(samples, 'generate', lambda: client.post('/generate-qr', json={'data': text}), 200).get_json()['qr_code']
+        timed_request(samples, 'save', lambda: client.post('/user/save-qr', json={'inputText': text, 'qrImage': qr_code}), 201)
+    codes = timed_request(samples, 'list', lambda: client.get('/user/qr-codes'), 200).get_json()
+    for code in codes:
+        timed_request(samples, 'delete', lambda: client.delete(f"/user/delete-qr/{code['id']}"), 200)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=4, help='concurrent virtual clients')
+    parser.add_argument('--iterations', type=int, default=25, help='journeys per client')
+    parser.add_argument('--dsn', help='disposable Postgres database for the user journey')
+    parser.add_argument('--output', help='write JSON results to this path')
+    args = parser.parse_args()
+
+    journeys = [stateless_journey]
+    if args.dsn:
+        backend.db_pool = ConnectionPool({'dsn': args.dsn}, maxconn=args.clients + 2, cursor_factory=TimedCursor)
+        run_migrations(ConnectionPool({'dsn': args.dsn}, maxconn=1))
+        journeys.append(user_journey)
+
+    samples = defaultdict(list)
+
+    def run_client(client_index):
+        client = backend.app.test_client()
+        for iteration in range(args.iterations):
+            for journey in journeys:
+                journey(client, client_index * args.iterations + iteration, samples)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        list(executor.map(run_client, range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    results = {name: summarize(durations, elapsed) for name, durations in sorted(samples.items())}
+    print_results(results)
+    if args.output:
+        write_results(args.output, 'load', results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# db.py
+import time
+import threading
+from contextlib import contextmanager
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.extras import RealDictCursor
+from metrics import registry
+
+ACQUIRE_SECONDS = registry.histogram('db_acquire_seconds', 'Time to borrow a connection, including waits and new connects.')
+QUERY_SECONDS = registry.histogram('db_query_seconds', 'Time spent in cursor.execute.')
+
+class TimedCursor(RealDictCursor):
+    """RealDictCursor that records how long each execute takes."""
+
+    def execute(self, query, vars=None):
+        with QUERY_SECONDS.time():
+            return super().execute(query, vars)
+
+class PoolTimeout(Exception):
+    """Raised when no database connection frees up within the acquire timeout."""
+
+class ConnectionPool:
+    """Thread-safe Postgres connection pool with blocking borrow, health checks and usage metrics."""
+
+    def __init__(self, database_config, minconn=1, maxconn=10, acquire_timeout=5.0,
+                 health_check_interval=30.0, **connect_kwargs):
+        self.database_config = database_config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+        self._pool = None
+        self._init_lock = threading.Lock()
+        # ThreadedConnectionPool raises when exhausted, the semaphore makes borrowers wait instead
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._metrics_lock = threading.Lock()
+        self.in_use = 0
+        self.borrows = 0
+        self.timeouts = 0
+        self.health_check_failures = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _get_pool(self):
+        # Created lazily so importing the app does not require a reachable database
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = pg_pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn, **self.database_config, **self.connect_kwargs
+                    )
+        return self._pool
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        # Only ping connections that sat idle long enough for the server or a proxy to drop them
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        """Borrow a healthy connection, waiting up to acquire_timeout for a free slot."""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"No database connection available after {self.acquire_timeout}s")
+        waited = time.monotonic() - started
+
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            while not self._is_healthy(conn):
+                with self._metrics_lock:
+                    self.health_check_failures += 1
+                self._last_used.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        ACQUIRE_SECONDS.observe(time.monotonic() - started)
+        with self._metrics_lock:
+            self.in_use += 1
+            self.borrows += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection, discarding any transaction the caller left open."""
+        close = conn.closed != 0
+        if not close and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                close = True
+        if close:
+            self._last_used.pop(id(conn), None)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+        self._get_pool().putconn(conn, close=close)
+        with self._metrics_lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block."""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+        self._last_used.clear()
+
+    def stats(self):
+        """Usage counters for monitoring pool sizing."""
+        with self._metrics_lock:
+            return {
+                'in_use': self.in_use,
+                'max_size': self.maxconn,
+                'borrows': self.borrows,
+                'timeouts': self.timeouts,
+                'health_check_failures': self.health_check_failures,
+                'wait_time_total': self.wait_time_total,
+                'wait_time_max': self.wait_time_max,
+            }
@@ -0,0 +1,55 @@
+# migrate.py
+import os
+import logging
+from psycopg2.extensions import cursor as TupleCursor
+from db import ConnectionPool
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+def pending_migrations(applied):
+    """List migration files in name order that have not been applied yet."""
+    names = sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith('.sql'))
+    return [name for name in names if name not in applied]
+
+def run_migrations(pool):
+    """Apply pending migrations, each in its own transaction, and record them in schema_migrations."""
+    with pool.connection() as conn:
+        with conn.cursor(cursor_factory=TupleCursor) as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    name TEXT PRIMARY KEY,
+                    applied_at TIMESTAMP NOT NULL DEFAULT now()
+                )
+                """
+            )
+            conn.commit()
+            cur.execute('SELECT name FROM schema_migrations')
+            applied = {row[0] for row in cur.fetchall()}
+            # End the read's transaction, autocommit cannot be switched while one is open
+            conn.commit()
+
+        for name in pending_migrations(applied):
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                sql = f.read()
+            # Migrations that need to run outside a transaction (e.g. CREATE INDEX CONCURRENTLY) say so on line one
+            autocommit = sql.startswith('-- no-transaction')
+            conn.autocommit = autocommit
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute('INSERT INTO schema_migrations (name) VALUES (%s)', (name,))
+                if not autocommit:
+                    conn.commit()
+            except Exception:
+                if not autocommit:
+                    conn.rollback()
+                raise
+            finally:
+                conn.autocommit = False
+            logging.info(f"Applied migration {name}")
+
+if __name__ == "__main__":
+    from app import DATABASE_CONFIG
+    logging.basicConfig(level=logging.INFO)
+    run_migrations(ConnectionPool(DATABASE_CONFIG, minconn=1, maxconn=1))
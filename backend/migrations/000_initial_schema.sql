@@ -0,0 +1,15 @@
+-- Base schema, a no-op on databases created before migrations existed
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS qr_codes (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    qr_text TEXT NOT NULL,
+    qr_image BYTEA NOT NULL,
+    timestamp TIMESTAMP NOT NULL DEFAULT now()
+);
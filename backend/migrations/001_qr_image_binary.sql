@@ -0,0 +1,9 @@
+-- Store QR images as raw PNG bytes instead of base64 text, or as render options only
+ALTER TABLE qr_codes ALTER COLUMN qr_image DROP NOT NULL;
+ALTER TABLE qr_codes ADD COLUMN IF NOT EXISTS render_options JSONB;
+
+-- Existing rows hold the base64 string as UTF-8 bytes, decode anything without a PNG signature
+UPDATE qr_codes
+SET qr_image = decode(convert_from(qr_image, 'UTF8'), 'base64')
+WHERE qr_image IS NOT NULL
+  AND substring(qr_image FROM 1 FOR 8) <> '\x89504e470d0a1a0a'::bytea;
@@ -0,0 +1,4 @@
+-- no-transaction
+-- Lets each /user/qr-codes page be a single index range scan in (timestamp, id) keyset order
+CREATE INDEX CONCURRENTLY IF NOT EXISTS qr_codes_user_timestamp_id_idx
+    ON qr_codes (user_id, timestamp DESC, id DESC);
@@ -0,0 +1,23 @@
+-- Content-addressed QR assets, shared by every saved code with the same text and render options
+CREATE TABLE IF NOT EXISTS qr_assets (
+    hash TEXT PRIMARY KEY,
+    qr_text TEXT NOT NULL,
+    qr_image BYTEA,
+    render_options JSONB NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    orphaned_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS qr_assets_orphaned_idx ON qr_assets (orphaned_at) WHERE ref_count = 0;
+
+-- Rows saved before this migration keep their inline image and have no asset
+ALTER TABLE qr_codes ADD COLUMN IF NOT EXISTS asset_hash TEXT REFERENCES qr_assets (hash);
+
+-- Cached per-user code count for quota checks, and soft-deletion for the background purge
+ALTER TABLE users ADD COLUMN IF NOT EXISTS qr_code_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;
+
+UPDATE users SET qr_code_count = counts.count
+FROM (SELECT user_id, count(*) AS count FROM qr_codes GROUP BY user_id) AS counts
+WHERE users.id = counts.user_id;
@@ -0,0 +1,8 @@
+-- Registered QR styles, keyed by a hash of their definition and logo so identical styles are stored once
+CREATE TABLE IF NOT EXISTS qr_styles (
+    hash TEXT PRIMARY KEY,
+    definition JSONB NOT NULL,
+    logo BYTEA,
+    created_by INTEGER REFERENCES users (id) ON DELETE SET NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
@@ -0,0 +1,3 @@
+-- Asset images used to be uploaded by whichever user saved a text first, and were then served to
+-- everyone sharing the asset. Drop them so they are re-rendered on the server from their options.
+UPDATE qr_assets SET qr_image = NULL WHERE qr_image IS NOT NULL;
@@ -0,0 +1,3 @@
+-- no-transaction
+-- Deleting an orphaned asset checks the qr_codes foreign key, which is a full scan without this index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS qr_codes_asset_hash_idx ON qr_codes (asset_hash);
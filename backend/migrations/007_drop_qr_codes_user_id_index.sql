@@ -0,0 +1,3 @@
+-- no-transaction
+-- Chunked purges by user_id are served by qr_codes_user_timestamp_id_idx, whose leading column is user_id
+DROP INDEX CONCURRENTLY IF EXISTS qr_codes_user_id_idx;
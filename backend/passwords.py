@@ -0,0 +1,57 @@
+# passwords.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from metrics import registry
+
+HASH_SECONDS = registry.histogram('password_hash_seconds', 'Password hash and verify time, including queueing.')
+HASH_REJECTED = registry.counter('password_hash_rejected_total', 'Hashing requests turned away because the pool was full.')
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated and the request should be rejected with a 429."""
+
+class PasswordHasher:
+    """Runs password hashing on a dedicated bounded thread pool.
+
+    hashlib's scrypt and pbkdf2 release the GIL, so threads give real parallelism here while
+    keeping request threads free for everything else. At most max_workers + max_pending
+    operations are admitted at once, anything beyond that fails fast with HashingBusy.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', max_workers=4, max_pending=16, timeout=10.0):
+        self.method = method
+        self.timeout = timeout
+        # werkzeug expands short methods like 'scrypt' or 'pbkdf2' with default parameters, so compare
+        # stored hashes against the prefix of a real hash rather than the configured string
+        self._prefix = generate_password_hash('', method).split('$', 1)[0]
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hash')
+        self._admission = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if not self._admission.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            HASH_REJECTED.inc()
+            raise HashingBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._admission.release()
+            raise
+        future.add_done_callback(lambda _: self._admission.release())
+        with HASH_SECONDS.time(operation=fn.__name__):
+            return future.result(timeout=self.timeout)
+
+    def hash(self, password):
+        """Hash password with the configured method and cost."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Check password against a stored hash."""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if pwhash was made with a different method or cost than the configured one."""
+        return pwhash.split('$', 1)[0] != self._prefix
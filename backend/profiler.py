@@ -0,0 +1,70 @@
+# profiler.py
+import os
+import re
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+
+def _collapse(frame):
+    """Folded stack for a frame, root first, as used by flamegraph.pl and speedscope."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class SlowRequestProfiler:
+    """Samples the stacks of in-flight requests and dumps them for requests slower than a threshold.
+
+    A single background thread wakes every `interval` seconds and only looks at threads that are
+    currently serving a request, so the cost is proportional to concurrency, not to traffic.
+    """
+
+    def __init__(self, directory, slow_seconds=1.0, interval=0.005):
+        self.directory = directory
+        self.slow_seconds = slow_seconds
+        self.interval = interval
+        self._active = {}  # thread id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._sample_forever, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def _sample_forever(self):
+        own_id = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own_id:
+                        stacks[_collapse(frame)] += 1
+
+    def begin(self):
+        """Start sampling the calling thread."""
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def end(self, duration, label):
+        """Stop sampling the calling thread and write its stacks if the request was slow."""
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if not stacks or duration < self.slow_seconds:
+            return
+        safe_label = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_') or 'request'
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{int(duration * 1000)}ms.folded"
+        try:
+            with open(os.path.join(self.directory, filename), 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logging.error(f"Profile write error: {str(e)}")
@@ -0,0 +1,114 @@
+# qr_batch.py
+import threading
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from qr_render import render_key, render_batch_item, image_extension, observe_render_timings
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Workers start from a clean server process rather than forking this multi-threaded one,
+# so they never inherit a lock held by a background thread
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def get_render_pool(max_workers=None):
+    """Return the shared process pool, creating it on first use. max_workers=None uses every core."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(_START_METHOD))
+        return _pool
+
+def discard_render_pool(pool):
+    """Drop a pool broken by a crashed worker, so the next get_render_pool() starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def render_many(jobs, cache, max_workers=None, chunksize=16):
+    """Render (data, options) jobs in order, returning an iterator of (image_bytes, error) for each one.
+
+    Cached renders are served directly, only the misses are sent to the process pool. Jobs are submitted
+    before this returns, so a failure to start rendering raises here rather than mid-iteration. A pool
+    found broken is replaced once, and items lost to a worker crash while rendering come back as errors.
+    """
+    keys = [render_key(data, options) for data, options in jobs]
+    results = [cache.get(key) for key in keys]
+    misses = [i for i, image_bytes in enumerate(results) if image_bytes is None]
+
+    pool = get_render_pool(max_workers)
+    try:
+        rendered = pool.map(render_batch_item, [jobs[i] for i in misses], chunksize=chunksize)
+    except BrokenProcessPool:
+        discard_render_pool(pool)
+        pool = get_render_pool(max_workers)
+        rendered = pool.map(render_batch_item, [jobs[i] for i in misses], chunksize=chunksize)
+
+    def merged():
+        pending = iter(rendered)
+        broken = False
+        for i, image_bytes in enumerate(results):
+            if image_bytes is not None:
+                yield image_bytes, None
+                continue
+            if not broken:
+                try:
+                    image_bytes, error, timings = next(pending)
+                except BrokenProcessPool:
+                    discard_render_pool(pool)
+                    broken = True
+            if broken:
+                yield None, "Render worker crashed"
+                continue
+            if timings is not None:
+                observe_render_timings(jobs[i][1], *timings)
+            if image_bytes is not None:
+                cache.set(keys[i], image_bytes)
+            yield image_bytes, error
+
+    return merged()
+
+class _ChunkWriter:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return b''.join(chunks)
+
+def stream_zip_entries(entries):
+    """Stream a ZIP built from (filename, bytes) entries, yielding archive bytes as they are written."""
+    writer = _ChunkWriter()
+    # PNGs are already deflated, so store entries as-is
+    with zipfile.ZipFile(writer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for filename, content in entries:
+            archive.writestr(filename, content)
+            yield writer.drain()
+    yield writer.drain()
+
+def stream_zip(results):
+    """Stream a ZIP of the rendered images, plus an errors.txt listing failed items."""
+    def entries():
+        errors = []
+        for index, (image_bytes, error) in enumerate(results):
+            if error is not None:
+                errors.append(f"{index}: {error}")
+            else:
+                yield f"qr_{index:05d}.{image_extension(image_bytes)}", image_bytes
+        if errors:
+            yield "errors.txt", "\n".join(errors) + "\n"
+
+    return stream_zip_entries(entries())
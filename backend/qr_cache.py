@@ -0,0 +1,219 @@
+# qr_cache.py
+import os
+import time
+import threading
+from collections import OrderedDict
+
+class RenderCache:
+    """Bounded in-process LRU cache for rendered QR images, with an optional shared backend."""
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=3600, backend=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return cached bytes for key, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+        # Fall back to the shared backend so workers can reuse each other's renders
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                with self._lock:
+                    self.backend_hits += 1
+                    self._store(key, value, now)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """Cache value under key, evicting the least recently used entries if needed."""
+        with self._lock:
+            self._store(key, value, time.monotonic())
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Counters for monitoring the hit rate."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'backend_hits': self.backend_hits,
+                'evictions': self.evictions,
+            }
+
+    def _store(self, key, value, now):
+        # Values larger than the whole budget are never worth keeping in memory
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (now + self.ttl, value)
+        self._size += len(value)
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._size -= len(value)
+
+class DiskCacheBackend:
+    """Shared cache backend storing one file per key, for workers on the same host.
+
+    Each file's mtime is set to its expiry time. At most every `sweep_interval` seconds a write sweeps
+    the directory, removing expired entries and then the soonest-expiring ones until it is back
+    within max_entries and max_bytes.
+    """
+
+    def __init__(self, directory, max_entries=1024, max_bytes=64 * 1024 * 1024, sweep_interval=60):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at = float(f.readline())
+                if expires_at < time.time():
+                    os.remove(path)
+                    return None
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value, ttl):
+        # Write to a temp file and rename so readers never see a partial entry
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        expires_at = time.time() + ttl
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(f"{expires_at}\n".encode('ascii'))
+                f.write(value)
+            os.utime(tmp_path, (time.time(), expires_at))
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            pass
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def sweep(self):
+        """Remove expired entries, then evict the soonest-expiring ones down to the size limits."""
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = time.monotonic()
+            now = time.time()
+            entries = []
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    # Temp files older than a sweep belong to writers that died mid-write
+                    if entry.name.endswith('.tmp'):
+                        if stat.st_mtime < now - self.sweep_interval:
+                            self._unlink(entry.path)
+                    elif stat.st_mtime < now:
+                        self._unlink(entry.path)
+                    else:
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for count, (_, size, path) in enumerate(entries):
+                if len(entries) - count <= self.max_entries and total <= self.max_bytes:
+                    break
+                self._unlink(path)
+                total -= size
+        finally:
+            self._sweep_lock.release()
+
+    def _unlink(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class RedisCacheBackend:
+    """Shared cache backend for anything speaking the Redis GET/SETEX commands."""
+
+    def __init__(self, client=None, url='redis://localhost:6379/0', prefix='qr:'):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("The 'redis' package is required for the Redis cache backend") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            return self.client.get(self.prefix + key)
+        except Exception:
+            # A cache outage should only cost us a re-render
+            return None
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.setex(self.prefix + key, int(ttl), value)
+        except Exception:
+            pass
+
+def create_render_cache(config):
+    """Build a RenderCache from a config dict like QR_CACHE_CONFIG in app.py."""
+    backend = None
+    if config.get('backend') == 'disk':
+        backend = DiskCacheBackend(
+            config['disk_directory'],
+            max_entries=config.get('disk_max_entries', 1024),
+            max_bytes=config.get('disk_max_bytes', 64 * 1024 * 1024),
+            sweep_interval=config.get('disk_sweep_interval', 60),
+        )
+    elif config.get('backend') == 'redis':
+        backend = RedisCacheBackend(url=config['redis_url'])
+    return RenderCache(
+        max_entries=config.get('max_entries', 1024),
+        max_bytes=config.get('max_bytes', 64 * 1024 * 1024),
+        ttl=config.get('ttl', 3600),
+        backend=backend,
+    )
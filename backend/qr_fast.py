@@ -0,0 +1,139 @@
+# qr_fast.py
+import zlib
+import struct
+import numpy as np
+import qrcode
+from qrcode.main import copy_2d_array, precomputed_qr_blanks
+
+def _png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+def png_from_modules(modules, box_size, border):
+    """Encode a QR module matrix as a 1-bit grayscale PNG without drawing through PIL.
+
+    Gives the same pixels as qrcode's PilImage: dark modules are black, each module is a
+    box_size square and the code is surrounded by `border` light modules.
+    """
+    matrix = np.pad(np.asarray(modules, dtype=bool), border, constant_values=False)
+    size = matrix.shape[0] * box_size
+
+    # Pack one scanline per module row (1 bits are white), then repeat it box_size times
+    scanlines = np.packbits(~matrix.repeat(box_size, axis=1), axis=1)
+    scanlines = np.hstack([np.zeros((scanlines.shape[0], 1), dtype=np.uint8), scanlines])  # filter type 0
+    raw = scanlines.repeat(box_size, axis=0).tobytes()
+
+    header = struct.pack('>IIBBBBB', size, size, 1, 0, 0, 0, 0)
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'IDAT', zlib.compress(raw, 6)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+def _dark_runs(matrix):
+    """Return (rows, starts, lengths) of every horizontal run of dark modules."""
+    # A light column on both sides of each row makes every run start and end inside its own row
+    height, width = matrix.shape
+    framed = np.zeros((height, width + 2), dtype=np.int8)
+    framed[:, 1:-1] = matrix
+    edges = np.diff(framed, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends - starts
+
+def svg_from_modules(modules, box_size, border):
+    """Encode a QR module matrix as SVG, merging each horizontal run of dark modules into one path segment."""
+    matrix = np.asarray(modules, dtype=bool)
+    size = matrix.shape[0] + 2 * border
+    rows, starts, lengths = _dark_runs(matrix)
+    path = ''.join(
+        f"M{x + border} {y + border}h{n}v1h-{n}z"
+        for y, x, n in zip(rows.tolist(), starts.tolist(), lengths.tolist())
+    )
+    pixels = size * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path fill="#000" d="{path}"/></svg>'
+    ).encode('utf-8')
+
+# Finder-like 1:1:3:1:1 patterns with four light modules on one side, penalised by the spec
+_FINDER_PATTERNS = np.array([
+    [1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 1, 1, 1, 0, 1],
+], dtype=bool)
+
+def _run_penalty(lines):
+    """Rule 1 for a (masks, lines, modules) stack: each run of 5+ same-colour modules costs length - 2."""
+    masks, count, length = lines.shape
+    starts = np.ones(lines.shape, dtype=bool)
+    starts[:, :, 1:] = lines[:, :, 1:] != lines[:, :, :-1]
+    # Every line begins a run, so run lengths never cross line boundaries
+    positions = np.flatnonzero(starts)
+    runs = np.diff(positions, append=lines.size)
+    long_runs = runs >= 5
+    return np.bincount(positions[long_runs] // (count * length), weights=runs[long_runs] - 2, minlength=masks)
+
+def _finder_penalty(lines):
+    """Rule 3 for a (masks, lines, modules) stack: 40 points per finder-like pattern."""
+    windows = np.lib.stride_tricks.sliding_window_view(lines, 11, axis=2)
+    matches = (windows[..., None, :] == _FINDER_PATTERNS).all(axis=-1).any(axis=-1)
+    return matches.sum(axis=(1, 2)) * 40
+
+def lost_points(stack):
+    """Penalty score of each matrix in a (masks, n, n) boolean stack.
+
+    Evaluates the same four rules as qrcode.util.lost_point, on every matrix at once.
+    """
+    count = stack.shape[1]
+    columns = stack.transpose(0, 2, 1)
+
+    penalty = _run_penalty(stack) + _run_penalty(columns)
+
+    top_left = stack[:, :-1, :-1]
+    uniform = (top_left == stack[:, :-1, 1:]) & (top_left == stack[:, 1:, :-1]) & (top_left == stack[:, 1:, 1:])
+    penalty += uniform.sum(axis=(1, 2)) * 3
+
+    penalty += _finder_penalty(stack) + _finder_penalty(columns)
+
+    percent = stack.sum(axis=(1, 2)) / count ** 2 * 100
+    penalty += (np.abs(percent - 50) / 5).astype(int) * 10
+    return penalty
+
+def _mask_stack(count):
+    """The eight mask patterns as a (8, n, n) boolean stack, True where a data module is flipped."""
+    i, j = np.indices((count, count))
+    return np.stack([
+        (i + j) % 2 == 0,
+        i % 2 == 0,
+        j % 3 == 0,
+        (i + j) % 3 == 0,
+        (i // 2 + j // 3) % 2 == 0,
+        (i * j) % 2 + (i * j) % 3 == 0,
+        ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+        ((i * j) % 3 + (i + j) % 2) % 2 == 0,
+    ])
+
+class FastMaskQRCode(qrcode.QRCode):
+    """QRCode that scores all eight mask patterns in one vectorized pass.
+
+    The data is placed once; every masked candidate is derived from it by XOR over the data
+    region, so the chosen pattern is the same as qrcode's own best_mask_pattern.
+    """
+
+    def best_mask_pattern(self):
+        self.makeImpl(True, 0)
+        placed = np.array(self.modules, dtype=bool)
+
+        # Data modules are the ones still unset once the function patterns are drawn
+        self.modules = copy_2d_array(precomputed_qr_blanks[self.version])
+        self.setup_type_info(True, 0)
+        if self.version >= 7:
+            self.setup_type_number(True)
+        data_region = np.array([[module is None for module in row] for row in self.modules])
+
+        masks = _mask_stack(self.modules_count)
+        unmasked = placed ^ (masks[0] & data_region)
+        candidates = unmasked ^ (masks & data_region)
+        return int(np.argmin(lost_points(candidates)))
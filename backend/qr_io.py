@@ -0,0 +1,79 @@
+# qr_io.py
+import io
+import csv
+import json
+from datetime import datetime, timezone
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+TEXT_COLUMNS = ('text', 'qr_text', 'inputText')
+
+def detect_import_format(filename, mimetype):
+    """Guess the import format of an uploaded file, defaulting to CSV."""
+    if (filename or '').lower().endswith(('.ndjson', '.jsonl')) or mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    return 'csv'
+
+def read_import_texts(stream, import_format):
+    """Yield (line_number, text, error) for each record of a CSV or NDJSON byte stream.
+
+    CSV files use the 'text' (or 'qr_text') column if they have a header row, otherwise the first column.
+    NDJSON lines are either JSON strings or objects with a 'text' field.
+    """
+    lines = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if import_format == 'ndjson':
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, None, "Invalid JSON"
+                continue
+            if isinstance(record, dict):
+                record = next((record[name] for name in TEXT_COLUMNS if name in record), None)
+            if not isinstance(record, str) or not record:
+                yield line_number, None, "No text provided"
+            else:
+                yield line_number, record, None
+        return
+
+    column = 0
+    for line_number, row in enumerate(csv.reader(lines), start=1):
+        if line_number == 1:
+            header = [cell.strip() for cell in row]
+            matching = [name for name in TEXT_COLUMNS if name in header]
+            if matching:
+                column = header.index(matching[0])
+                continue
+        text = row[column] if len(row) > column else ''
+        if not text:
+            yield line_number, None, "No text provided"
+        else:
+            yield line_number, text, None
+
+def batched(iterable, size):
+    """Yield lists of up to size items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def isoformat_utc(timestamp):
+    """ISO format string with timezone info, treating naive timestamps as UTC."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.isoformat()
+
+def ndjson_record(qr_code):
+    """One export line for a qr_codes row."""
+    timestamp = qr_code['timestamp']
+    return json.dumps({
+        'id': qr_code['id'],
+        'text': qr_code['qr_text'],
+        'timestamp': isoformat_utc(timestamp) if isinstance(timestamp, datetime) else timestamp,
+        'render_options': qr_code['render_options'],
+    }) + '\n'
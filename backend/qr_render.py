@@ -0,0 +1,178 @@
+# qr_render.py
+import io
+import re
+import time
+import json
+import base64
+import hashlib
+import qrcode
+import qr_fast
+from metrics import registry
+
+ENCODE_SECONDS = registry.histogram('qr_encode_seconds', 'Time to build the QR module matrix, by profile.')
+IMAGE_SECONDS = registry.histogram('qr_image_encode_seconds', 'Time to draw and encode the image, by engine and format.')
+
+# Defaults match qrcode.make() so existing clients get identical images
+DEFAULT_RENDER_OPTIONS = {
+    'box_size': 10,
+    'border': 4,
+    'engine': 'pil',
+    'format': 'png',
+    'version': None,
+    'error_correction': 'M',
+    'mask_pattern': None,
+    'profile': 'default',
+}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Bounds for client-supplied options, keeps a single request from rendering huge images
+RENDER_OPTION_LIMITS = {
+    'box_size': (1, 50),
+    'border': (0, 20),
+    'version': (1, 40),
+    'mask_pattern': (0, 7),
+}
+
+# 'numpy' rasterises the module matrix directly and gives the same pixels as 'pil'.
+# The 'fast' profile picks the same mask as 'default' but scores all eight candidates in one NumPy pass.
+RENDER_OPTION_CHOICES = {
+    'engine': ('pil', 'numpy'),
+    'format': ('png', 'svg'),
+    'error_correction': ('L', 'M', 'Q', 'H'),
+    'profile': ('default', 'fast'),
+}
+
+# Registered style ids are SHA-256 hex digests, see qr_styles.style_hash
+STYLE_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+ERROR_CORRECTION_LEVELS = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+RENDER_MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+def normalize_render_options(options=None):
+    """Validate client render options and fill in defaults. Raises ValueError on bad input."""
+    options = options or {}
+    normalized = dict(DEFAULT_RENDER_OPTIONS)
+    for name, (low, high) in RENDER_OPTION_LIMITS.items():
+        value = options.get(name)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+            raise ValueError(f"'{name}' must be an integer between {low} and {high}")
+        normalized[name] = value
+    for name, choices in RENDER_OPTION_CHOICES.items():
+        value = options.get(name)
+        if value is None:
+            continue
+        if value not in choices:
+            raise ValueError(f"'{name}' must be one of {', '.join(choices)}")
+        normalized[name] = value
+    # Only styled renders carry a 'style', so plain render keys stay as they were
+    style = options.get('style')
+    if style is not None:
+        if not isinstance(style, str) or not STYLE_ID_PATTERN.match(style):
+            raise ValueError("'style' must be a style id returned by /user/styles")
+        if normalized['format'] != 'png':
+            raise ValueError("Styled QR codes are only available as png")
+        normalized['style'] = style
+    return normalized
+
+def render_options_from_args(args):
+    """Read render options from query string arguments, where 'size' is an alias for 'box_size'."""
+    options = {name: args[name] for name in (*RENDER_OPTION_LIMITS, *RENDER_OPTION_CHOICES, 'style') if name in args}
+    if 'size' in args:
+        options['box_size'] = args['size']
+    for name in RENDER_OPTION_LIMITS:
+        if name in options:
+            try:
+                options[name] = int(options[name])
+            except ValueError:
+                raise ValueError(f"'{name}' must be an integer") from None
+    return options
+
+def render_key(data, options):
+    """Content-addressed key for a render: a hash of the payload and its normalized options."""
+    payload = json.dumps({'data': data, 'options': options}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def build_qr(data, options):
+    """Encode data into a QRCode whose module matrix is ready to draw.
+
+    A pinned version is used as-is, raising qrcode.exceptions.DataOverflowError if the data does not fit.
+    """
+    qr_class = qr_fast.FastMaskQRCode if options['profile'] == 'fast' else qrcode.QRCode
+    qr = qr_class(
+        version=options['version'],
+        error_correction=ERROR_CORRECTION_LEVELS[options['error_correction']],
+        box_size=options['box_size'],
+        border=options['border'],
+        mask_pattern=options['mask_pattern'],
+    )
+    qr.add_data(data)
+    qr.make(fit=options['version'] is None)
+    return qr
+
+def _render_timed(data, options):
+    """Render like render_image, returning (image_bytes, encode_seconds, image_seconds) without recording them."""
+    started = time.perf_counter()
+    qr = build_qr(data, options)
+    encoded = time.perf_counter()
+    if options['format'] == 'svg':
+        image_bytes = qr_fast.svg_from_modules(qr.modules, options['box_size'], options['border'])
+    elif options['engine'] == 'numpy':
+        image_bytes = qr_fast.png_from_modules(qr.modules, options['box_size'], options['border'])
+    else:
+        img_buffer = io.BytesIO()
+        qr.make_image().save(img_buffer, format="PNG")
+        image_bytes = img_buffer.getvalue()
+    return image_bytes, encoded - started, time.perf_counter() - encoded
+
+def observe_render_timings(options, encode_seconds, image_seconds):
+    """Record the timings of one render in the encode and image histograms."""
+    ENCODE_SECONDS.observe(encode_seconds, profile=options['profile'])
+    IMAGE_SECONDS.observe(image_seconds, engine=options['engine'], format=options['format'])
+
+def render_image(data, options):
+    """Render a QR code for data and return the image bytes in options['format']."""
+    image_bytes, encode_seconds, image_seconds = _render_timed(data, options)
+    observe_render_timings(options, encode_seconds, image_seconds)
+    return image_bytes
+
+def render_styled(data, options, template):
+    """Render a QR code for data as a PNG in a registered style, see qr_styles.StyleTemplate."""
+    with ENCODE_SECONDS.time(profile=options['profile']):
+        qr = build_qr(data, options)
+    with IMAGE_SECONDS.time(engine='styled', format='png'):
+        return template.render_png(qr.modules, options['box_size'], options['border'], options['error_correction'])
+
+def image_extension(image_bytes):
+    """File extension for rendered image bytes."""
+    return 'png' if image_bytes.startswith(PNG_SIGNATURE) else 'svg'
+
+def stored_image_to_png(qr_image):
+    """Return PNG bytes for a qr_codes.qr_image value, decoding rows still holding base64 text."""
+    png_bytes = bytes(qr_image)
+    if not png_bytes.startswith(PNG_SIGNATURE):
+        png_bytes = base64.b64decode(png_bytes)
+    return png_bytes
+
+def render_batch_item(args):
+    """Process pool entry point: render one (data, options) pair and return (image_bytes, error, timings).
+
+    A worker's own metrics registry is never scraped, so the (encode, image) timings go back to the parent.
+    """
+    data, options = args
+    try:
+        image_bytes, encode_seconds, image_seconds = _render_timed(data, options)
+        return image_bytes, None, (encode_seconds, image_seconds)
+    except Exception as e:
+        return None, str(e), None
@@ -0,0 +1,178 @@
+# qr_storage.py
+import logging
+import threading
+from psycopg2.extras import Json, execute_values
+from metrics import registry
+
+PURGED_CODES = registry.counter('qr_purged_codes_total', 'Saved codes removed by deleted-account purges.')
+COLLECTED_ASSETS = registry.counter('qr_collected_assets_total', 'Orphaned QR assets removed by garbage collection.')
+
+class QuotaExceeded(Exception):
+    """Raised when saving would take a user past their saved-code quota."""
+
+def reserve_quota(cur, user_id, count, limit):
+    """Add count to the user's cached code counter, raising QuotaExceeded instead of passing limit."""
+    cur.execute(
+        """
+        UPDATE users SET qr_code_count = qr_code_count + %s
+        WHERE id = %s AND deleted_at IS NULL AND qr_code_count + %s <= %s
+        RETURNING qr_code_count
+        """,
+        (count, user_id, count, limit)
+    )
+    if cur.fetchone() is None:
+        raise QuotaExceeded()
+
+def release_quota(cur, user_id, count):
+    cur.execute(
+        'UPDATE users SET qr_code_count = GREATEST(qr_code_count - %s, 0) WHERE id = %s',
+        (count, user_id)
+    )
+
+def acquire_assets(cur, assets):
+    """Take references on content-addressed assets, creating the missing ones.
+
+    assets maps hash -> (qr_text, png_bytes or None, render_options, references). png_bytes must be
+    rendered on the server, since every user referencing the asset is served the same image.
+    """
+    rows = [
+        (asset_hash, qr_text, png_bytes, Json(options), references)
+        for asset_hash, (qr_text, png_bytes, options, references) in sorted(assets.items())
+    ]
+    # Sorted rows keep lock order stable between concurrent saves
+    execute_values(
+        cur,
+        """
+        INSERT INTO qr_assets (hash, qr_text, qr_image, render_options, ref_count) VALUES %s
+        ON CONFLICT (hash) DO UPDATE
+        SET ref_count = qr_assets.ref_count + EXCLUDED.ref_count, orphaned_at = NULL,
+            qr_image = COALESCE(qr_assets.qr_image, EXCLUDED.qr_image)
+        """,
+        rows,
+        page_size=len(rows) or 1,
+    )
+
+def store_asset_images(cur, assets):
+    """Insert assets with their images but no references, ahead of the transaction that references them.
+
+    assets maps hash -> (qr_text, png_bytes, render_options). New assets start out orphaned, so
+    collect_orphaned_assets removes them if no reference follows. Existing assets are neither changed nor locked.
+    """
+    rows = [
+        (asset_hash, qr_text, png_bytes, Json(options))
+        for asset_hash, (qr_text, png_bytes, options) in sorted(assets.items())
+    ]
+    execute_values(
+        cur,
+        """
+        INSERT INTO qr_assets (hash, qr_text, qr_image, render_options, ref_count, orphaned_at) VALUES %s
+        ON CONFLICT (hash) DO NOTHING
+        """,
+        rows,
+        template='(%s, %s, %s, %s, 0, now())',
+        page_size=len(rows) or 1,
+    )
+
+def release_assets(cur, references):
+    """Drop references on assets, given hash -> count. Assets reaching zero are left for collect_orphaned_assets."""
+    if not references:
+        return
+    execute_values(
+        cur,
+        """
+        UPDATE qr_assets AS a
+        SET ref_count = GREATEST(a.ref_count - r.count, 0),
+            orphaned_at = CASE WHEN a.ref_count - r.count <= 0 THEN now() END
+        FROM (VALUES %s) AS r (hash, count)
+        WHERE a.hash = r.hash
+        """,
+        sorted(references.items()),
+    )
+
+def purge_deleted_users(pool, chunk_size):
+    """Delete the codes of accounts marked deleted in small transactions, then the accounts themselves.
+
+    Each chunk commits on its own so no single statement holds locks on a large account for long.
+    """
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute('SELECT id FROM users WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT 100')
+        user_ids = [row['id'] for row in cur.fetchall()]
+
+        for user_id in user_ids:
+            while True:
+                cur.execute(
+                    """
+                    WITH doomed AS (
+                        DELETE FROM qr_codes
+                        WHERE id IN (SELECT id FROM qr_codes WHERE user_id = %s LIMIT %s)
+                        RETURNING asset_hash
+                    )
+                    SELECT asset_hash, count(*) AS count FROM doomed GROUP BY asset_hash
+                    """,
+                    (user_id, chunk_size)
+                )
+                deleted = cur.fetchall()
+                if not deleted:
+                    break
+                release_assets(cur, {row['asset_hash']: row['count'] for row in deleted if row['asset_hash']})
+                conn.commit()
+                PURGED_CODES.inc(sum(row['count'] for row in deleted))
+
+            cur.execute('DELETE FROM users WHERE id = %s AND deleted_at IS NOT NULL', (user_id,))
+            conn.commit()
+
+def collect_orphaned_assets(pool, batch_size, grace_seconds):
+    """Delete unreferenced assets in batches, once they have been orphaned for grace_seconds."""
+    while True:
+        with pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM qr_assets WHERE hash IN (
+                    SELECT hash FROM qr_assets
+                    WHERE ref_count = 0 AND orphaned_at < now() - make_interval(secs => %s)
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                (grace_seconds, batch_size)
+            )
+            collected = cur.rowcount
+            conn.commit()
+        COLLECTED_ASSETS.inc(collected)
+        if collected < batch_size:
+            return
+
+class StorageMaintenance:
+    """Background thread running account purges and asset garbage collection.
+
+    Runs every `interval` seconds, or straight away when wake() is called after an account deletion.
+    """
+
+    def __init__(self, pool, interval=60, purge_chunk_size=1000, gc_batch_size=1000, gc_grace_seconds=3600):
+        self.pool = pool
+        self.interval = interval
+        self.purge_chunk_size = purge_chunk_size
+        self.gc_batch_size = gc_batch_size
+        self.gc_grace_seconds = gc_grace_seconds
+        self._wake = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(target=self._run_forever, name='qr-storage-maintenance', daemon=True)
+        thread.start()
+        return thread
+
+    def wake(self):
+        self._wake.set()
+
+    def run_once(self):
+        purge_deleted_users(self.pool, self.purge_chunk_size)
+        collect_orphaned_assets(self.pool, self.gc_batch_size, self.gc_grace_seconds)
+
+    def _run_forever(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Storage maintenance error: {str(e)}")
@@ -0,0 +1,296 @@
+# qr_styles.py
+import io
+import re
+import json
+import hashlib
+import time
+import functools
+import threading
+from collections import OrderedDict
+import numpy as np
+import qrcode
+from qrcode.base import rs_blocks
+from PIL import Image
+from qr_render import PNG_SIGNATURE, ERROR_CORRECTION_LEVELS
+
+MODULE_SHAPES = ('square', 'gapped', 'rounded', 'circle')
+
+DEFAULT_STYLE = {
+    'foreground': '#000000',
+    'background': '#ffffff',
+    'module_shape': 'square',
+    'logo_size': 0.2,
+}
+
+# Share of the symbol's width a logo may take, before it is shrunk to what error correction can repair
+LOGO_SIZE_LIMITS = (0.05, 0.3)
+MAX_LOGO_BYTES = 512 * 1024
+# A small PNG can declare huge dimensions, so pixel size is checked from the header before decoding
+MAX_LOGO_PIXELS = 1024
+
+_COLOUR_PATTERN = re.compile(r'^#[0-9a-fA-F]{6}$')
+
+class UnknownStyle(LookupError):
+    """Raised when a render names a style id that was never registered."""
+
+def normalize_style(definition, logo_bytes=None):
+    """Validate a style definition and fill in defaults. Raises ValueError on bad input."""
+    definition = definition or {}
+    style = dict(DEFAULT_STYLE)
+    for name in ('foreground', 'background'):
+        value = definition.get(name)
+        if value is None:
+            continue
+        if not isinstance(value, str) or not _COLOUR_PATTERN.match(value):
+            raise ValueError(f"'{name}' must be a colour like #1a2b3c")
+        style[name] = value.lower()
+    shape = definition.get('module_shape')
+    if shape is not None:
+        if shape not in MODULE_SHAPES:
+            raise ValueError(f"'module_shape' must be one of {', '.join(MODULE_SHAPES)}")
+        style['module_shape'] = shape
+    logo_size = definition.get('logo_size')
+    if logo_size is not None:
+        low, high = LOGO_SIZE_LIMITS
+        if isinstance(logo_size, bool) or not isinstance(logo_size, (int, float)) or not low <= logo_size <= high:
+            raise ValueError(f"'logo_size' must be a number between {low} and {high}")
+        style['logo_size'] = float(logo_size)
+    if logo_bytes is not None:
+        if len(logo_bytes) > MAX_LOGO_BYTES or not logo_bytes.startswith(PNG_SIGNATURE):
+            raise ValueError(f"'logo' must be a PNG of at most {MAX_LOGO_BYTES // 1024} KB")
+    return style
+
+def load_logo(logo_bytes):
+    """Decode a logo to RGBA, refusing images larger than MAX_LOGO_PIXELS on either side. Raises ValueError."""
+    try:
+        img = Image.open(io.BytesIO(logo_bytes))
+        # Image.open only reads the header, nothing is decoded before this check
+        if max(img.size) > MAX_LOGO_PIXELS:
+            raise ValueError(f"'logo' must be at most {MAX_LOGO_PIXELS}x{MAX_LOGO_PIXELS} pixels")
+        return img.convert('RGBA')
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError("'logo' must be a valid PNG") from None
+
+def style_hash(style, logo_bytes=None):
+    """Content-addressed id of a style, so equal styles share one template and cache entries."""
+    digest = hashlib.sha256(json.dumps(style, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    digest.update(logo_bytes or b'')
+    return digest.hexdigest()
+
+# Error correction codewords reserved for misdecode protection on the smallest codes (ISO 18004 table 9)
+_MISDECODE_PROTECTION = {(1, 'L'): 3, (1, 'M'): 2, (1, 'Q'): 1, (1, 'H'): 1, (2, 'L'): 2, (3, 'L'): 1}
+
+@functools.lru_cache(maxsize=None)
+def codeword_layout(version, error_correction):
+    """Map a symbol's modules to Reed-Solomon blocks.
+
+    Returns (codewords, blocks, capacity): the codeword index of every module, -1 for function
+    patterns and remainder bits, the block each codeword belongs to and how many wrong codewords
+    each block can correct.
+    """
+    qr = qrcode.QRCode(version=version, error_correction=ERROR_CORRECTION_LEVELS[error_correction])
+    n = qr.modules_count = version * 4 + 17
+    qr.modules = [[None] * n for _ in range(n)]
+    qr.setup_position_probe_pattern(0, 0)
+    qr.setup_position_probe_pattern(n - 7, 0)
+    qr.setup_position_probe_pattern(0, n - 7)
+    qr.setup_position_adjust_pattern()
+    qr.setup_timing_pattern()
+    qr.setup_type_info(False, 0)
+    if version >= 7:
+        qr.setup_type_number(False)
+
+    rs = rs_blocks(version, qr.error_correction)
+    # Codewords are interleaved: the i-th data codeword of every block, then the same for EC codewords
+    blocks = [b for i in range(max(r.data_count for r in rs)) for b, r in enumerate(rs) if i < r.data_count]
+    blocks += [b for i in range(max(r.total_count - r.data_count for r in rs))
+               for b, r in enumerate(rs) if i < r.total_count - r.data_count]
+    protection = _MISDECODE_PROTECTION.get((version, error_correction), 0)
+    capacity = np.array([(r.total_count - r.data_count - protection) // 2 for r in rs])
+
+    # Same zigzag as QRCode.map_data: two-column strips from the right, skipping the vertical timing pattern
+    codewords = np.full((n, n), -1, dtype=np.int32)
+    bit = 0
+    row, step = n - 1, -1
+    for col in range(n - 1, 0, -2):
+        if col <= 6:
+            col -= 1
+        while 0 <= row < n:
+            for c in (col, col - 1):
+                if qr.modules[row][c] is None:
+                    if bit // 8 < len(blocks):
+                        codewords[row, c] = bit // 8
+                    bit += 1
+            row += step
+        row -= step
+        step = -step
+    return codewords, np.array(blocks), capacity
+
+def logo_fits(version, error_correction, first, last):
+    """Whether covering modules first..last (inclusive) in both directions leaves every block correctable."""
+    codewords, blocks, capacity = codeword_layout(version, error_correction)
+    covered = codewords[first:last + 1, first:last + 1]
+    covered = np.unique(covered[covered >= 0])
+    return bool((np.bincount(blocks[covered], minlength=len(capacity)) <= capacity).all())
+
+def _rgb(colour):
+    return np.array([int(colour[i:i + 2], 16) for i in (1, 3, 5)], dtype=np.uint8)
+
+def _module_tile(shape, box_size):
+    """Boolean box_size x box_size stamp for one dark module."""
+    y, x = np.mgrid[0:box_size, 0:box_size] + 0.5
+    centre = box_size / 2
+    if shape == 'circle':
+        return (x - centre) ** 2 + (y - centre) ** 2 <= centre ** 2
+    if shape == 'gapped':
+        gap = max(1, box_size // 10)
+        tile = np.zeros((box_size, box_size), dtype=bool)
+        tile[gap:box_size - gap, gap:box_size - gap] = True
+        return tile if tile.any() else np.ones((box_size, box_size), dtype=bool)
+    if shape == 'rounded':
+        radius = box_size / 4
+        inner = np.clip(np.abs(x - centre), None, centre - radius), np.clip(np.abs(y - centre), None, centre - radius)
+        return (np.abs(x - centre) - inner[0]) ** 2 + (np.abs(y - centre) - inner[1]) ** 2 <= radius ** 2
+    return np.ones((box_size, box_size), dtype=bool)
+
+class StyleTemplate:
+    """A registered style with its layers pre-rasterised per output geometry.
+
+    Rendering is then a mask-and-blend of the module matrix over cached layers: the module stamp,
+    the square finder-pattern region and the logo patch. Images are palette PNGs, index 0 is the
+    background, 1 the foreground and the rest hold the logo, quantised once to at most 254 colours.
+    The logo is shrunk per version and error correction level until every codeword it covers can be repaired.
+    """
+
+    max_layouts = 32
+
+    def __init__(self, style, logo_bytes=None):
+        self.style = style
+        self.logo = load_logo(logo_bytes) if logo_bytes else None
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def has_logo(self):
+        return self.logo is not None
+
+    def _logo_side(self, box_size, border, modules_count, error_correction):
+        """Logo width in pixels: logo_size of the symbol, shrunk until error correction can repair what it covers."""
+        size = (modules_count + 2 * border) * box_size
+        version = (modules_count - 17) // 4
+        fits = {}
+        for side in range(int(modules_count * box_size * self.style['logo_size']), 0, -1):
+            offset = (size - side) // 2
+            span = (offset // box_size - border, (offset + side - 1) // box_size - border)
+            if span not in fits:
+                fits[span] = logo_fits(version, error_correction, *span)
+            if fits[span]:
+                return side
+        return 0
+
+    def _layout(self, box_size, border, modules_count, error_correction):
+        key = (box_size, border, modules_count, error_correction)
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is not None:
+                self._layouts.move_to_end(key)
+                return layout
+
+        size = (modules_count + 2 * border) * box_size
+        # Finder patterns stay square so scanners still lock on, whatever the module shape
+        eyes = np.zeros((modules_count + 2 * border,) * 2, dtype=bool)
+        for row, col in ((0, 0), (0, modules_count - 7), (modules_count - 7, 0)):
+            eyes[border + row:border + row + 7, border + col:border + col + 7] = True
+        layout = {
+            'tile': _module_tile(self.style['module_shape'], box_size),
+            'eyes': eyes,
+            'palette': [*_rgb(self.style['background']), *_rgb(self.style['foreground'])],
+            'logo': None,
+        }
+
+        side = self._logo_side(box_size, border, modules_count, error_correction) if self.logo is not None else 0
+        if side:
+            # Centre the logo on a background square, blend and quantise it once per geometry
+            logo = np.asarray(self.logo.resize((side, side), Image.LANCZOS), dtype=np.float32)
+            alpha = logo[..., 3:] / 255
+            patch = logo[..., :3] * alpha + _rgb(self.style['background']) * (1 - alpha)
+            quantised = Image.fromarray(np.round(patch).astype(np.uint8), 'RGB').quantize(colors=254)
+            layout['palette'] += quantised.getpalette()[:3 * 254]
+            offset = (size - side) // 2
+            layout['logo'] = (offset, offset + side, np.asarray(quantised, dtype=np.uint8) + 2)
+
+        # Fewest bits per pixel that hold the palette, two-colour styles encode as compactly as plain codes
+        colours = len(layout['palette']) // 3
+        layout['bits'] = next(bits for bits in (1, 2, 4, 8) if colours <= 1 << bits)
+
+        with self._lock:
+            self._layouts[key] = layout
+            while len(self._layouts) > self.max_layouts:
+                self._layouts.popitem(last=False)
+        return layout
+
+    def render_png(self, modules, box_size, border, error_correction='H'):
+        """Render a module matrix encoded at error_correction in this style and return the PNG bytes."""
+        matrix = np.pad(np.asarray(modules, dtype=bool), border, constant_values=False)
+        layout = self._layout(box_size, border, len(modules), error_correction)
+        size = matrix.shape[0] * box_size
+
+        # Stamp the module shape on every dark module, then fill finder patterns back in as full squares
+        eyes = (matrix & layout['eyes'])[:, None, :, None]
+        shaped = (matrix[:, None, :, None] & layout['tile'][None, :, None, :]) | eyes
+        pixels = shaped.reshape(size, size).view(np.uint8)
+        if layout['logo'] is not None:
+            start, end, patch = layout['logo']
+            pixels[start:end, start:end] = patch
+
+        img = Image.fromarray(pixels, 'P')
+        img.putpalette(layout['palette'])
+        img_buffer = io.BytesIO()
+        img.save(img_buffer, format="PNG", bits=layout['bits'])
+        return img_buffer.getvalue()
+
+class TemplateCache:
+    """Bounded LRU of StyleTemplates by style hash.
+
+    Hashes found unregistered are remembered for missing_ttl seconds, so repeated requests for them
+    do not each cost a database query.
+    """
+
+    def __init__(self, max_entries=256, max_missing=4096, missing_ttl=60):
+        self.max_entries = max_entries
+        self.max_missing = max_missing
+        self.missing_ttl = missing_ttl
+        self._templates = OrderedDict()
+        self._missing = OrderedDict()  # key -> expires_at
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+            return template
+
+    def set(self, key, template):
+        with self._lock:
+            self._missing.pop(key, None)
+            self._templates[key] = template
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+
+    def is_missing(self, key):
+        with self._lock:
+            expires_at = self._missing.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._missing[key]
+                return False
+            return True
+
+    def set_missing(self, key):
+        with self._lock:
+            self._missing[key] = time.monotonic() + self.missing_ttl
+            self._missing.move_to_end(key)
+            while len(self._missing) > self.max_missing:
+                self._missing.popitem(last=False)
@@ -0,0 +1,179 @@
+# sessions.py
+import time
+import secrets
+import logging
+import threading
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, BadSignature
+from werkzeug.datastructures import CallbackDict
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session whose data lives in a store and whose cookie only carries a signed id."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+class MemorySessionStore:
+    """In-process session store with per-entry expiry, for single-node deployments."""
+
+    def __init__(self):
+        self._entries = {}  # sid -> (expires_at, payload)
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def set(self, sid, payload, ttl):
+        with self._lock:
+            self._entries[sid] = (time.time() + ttl, payload)
+
+    def touch(self, sid, ttl):
+        """Push back the expiry of a live entry without rewriting it."""
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                self._entries[sid] = (time.time() + ttl, entry[1])
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def sweep(self):
+        """Drop expired entries, returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (expires_at, _) in self._entries.items() if expires_at < now]
+            for sid in expired:
+                del self._entries[sid]
+        return len(expired)
+
+class RedisSessionStore:
+    """Session store for anything speaking the Redis GET/SETEX/EXPIRE/DEL commands, shared across hosts."""
+
+    def __init__(self, client=None, url='redis://localhost:6379/0', prefix='session:'):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("The 'redis' package is required for the Redis session backend") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid):
+        payload = self.client.get(self.prefix + sid)
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8')
+        return payload
+
+    def set(self, sid, payload, ttl):
+        self.client.setex(self.prefix + sid, int(ttl), payload)
+
+    def touch(self, sid, ttl):
+        self.client.expire(self.prefix + sid, int(ttl))
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+    def sweep(self):
+        # Redis expires keys on its own
+        return 0
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface backed by a session store.
+
+    The payload is only written when the session was modified. Permanent sessions get a sliding
+    expiry as with SESSION_REFRESH_EACH_REQUEST: other requests just refresh the store TTL and the cookie.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='session-id')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            if sid:
+                payload = self.store.get(sid)
+                if payload is not None:
+                    return ServerSideSession(self.serializer.loads(payload), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        ttl = app.permanent_session_lifetime.total_seconds()
+        if session.modified:
+            self.store.set(session.sid, self.serializer.dumps(dict(session)), ttl)
+        else:
+            self.store.touch(session.sid, ttl)
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+def start_sweeper(store, interval):
+    """Periodically remove expired sessions on a daemon thread."""
+    def sweep_forever():
+        while True:
+            time.sleep(interval)
+            try:
+                store.sweep()
+            except Exception as e:
+                logging.error(f"Session sweep error: {str(e)}")
+
+    thread = threading.Thread(target=sweep_forever, name='session-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+def init_sessions(app, config):
+    """Install the session backend named in config: 'memory', 'redis' or 'cookie'.
+
+    'cookie' keeps Flask's stateless signed-cookie sessions.
+    """
+    backend = config.get('backend', 'memory')
+    if backend == 'cookie':
+        return
+    if backend == 'memory':
+        store = MemorySessionStore()
+        start_sweeper(store, config.get('sweep_interval', 60))
+    elif backend == 'redis':
+        store = RedisSessionStore(url=config['redis_url'])
+    else:
+        raise ValueError(f"Unknown session backend: {backend}")
+    app.session_interface = ServerSideSessionInterface(store)
@@ -0,0 +1,97 @@
+# conftest.py
+import os
+import sys
+import contextlib
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+
+class FakeCursor:
+    """Cursor answering queries from FakeDatabase.results, and recording what was executed."""
+
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def execute(self, query, params=None):
+        query = ' '.join(query.split())
+        self.db.queries.append((query, params))
+        self.rows = []
+        for fragment, result in self.db.results:
+            if fragment in query:
+                self.rows = list(result(params) if callable(result) else result)
+                break
+        self.rowcount = len(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, name=None, **kwargs):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        self.db.commits += 1
+
+    def rollback(self):
+        pass
+
+class FakeDatabase:
+    """Stands in for the connection pool. results is a list of (query fragment, rows or callable(params))."""
+
+    def __init__(self):
+        self.results = []
+        self.queries = []
+        self.commits = 0
+        self.open_connections = 0
+        self.max_open_connections = 0
+
+    def on(self, fragment, result):
+        self.results.append((fragment, result))
+
+    @contextlib.contextmanager
+    def connection(self):
+        self.open_connections += 1
+        self.max_open_connections = max(self.max_open_connections, self.open_connections)
+        try:
+            yield FakeConnection(self)
+        finally:
+            self.open_connections -= 1
+
+@pytest.fixture
+def app():
+    app_module.render_cache.clear()
+    return app_module.app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDatabase()
+    monkeypatch.setattr(app_module, 'get_db_connection', db.connection)
+    monkeypatch.setattr(app_module, 'style_templates', app_module.TemplateCache())
+    return db
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
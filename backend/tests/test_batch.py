@@ -0,0 +1,31 @@
+# test_batch.py
+import io
+import zipfile
+from qr_render import PNG_SIGNATURE
+
+def test_zip_batch_renders_every_item(client):
+    response = client.post('/generate-qr/batch', json={"items": ["a", "b"], "format": "zip"})
+
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.namelist() == ["qr_00000.png", "qr_00001.png"]
+    assert archive.read("qr_00000.png").startswith(PNG_SIGNATURE)
+
+def test_json_batch_ignores_the_response_format(client):
+    response = client.post('/generate-qr/batch', json={"items": ["a", "b"], "format": "json"})
+
+    assert response.status_code == 200
+    assert [item.get("error") for item in response.json] == [None, None]
+
+def test_items_can_still_pick_their_image_format(client):
+    response = client.post('/generate-qr/batch', json={"items": [{"data": "a", "format": "svg"}], "format": "zip"})
+
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.namelist() == ["qr_00000.svg"]
+
+def test_invalid_items_are_reported_per_item(client):
+    response = client.post('/generate-qr/batch', json={"items": ["a", {"data": "b", "box_size": 0}]})
+
+    assert response.status_code == 200
+    assert "error" not in response.json[0]
+    assert "box_size" in response.json[1]["error"]
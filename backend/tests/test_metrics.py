@@ -0,0 +1,38 @@
+# test_metrics.py
+from metrics import Histogram
+
+def sample(metrics_text, prefix):
+    for line in metrics_text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+def test_batch_render_timings_reach_the_parent_registry(client):
+    series = 'qr_encode_seconds_count{profile="fast"}'
+    before = sample(client.get('/metrics').get_data(as_text=True), series)
+
+    response = client.post('/generate-qr/batch', json={"items": ["metrics-a", "metrics-b"], "profile": "fast"})
+    assert response.status_code == 200
+
+    after = sample(client.get('/metrics').get_data(as_text=True), series)
+    assert after - before == 2
+
+def test_values_above_the_last_bucket_leave_the_sum_alone():
+    histogram = Histogram('x', 'y', (1, 2))
+
+    histogram.observe(5)
+    histogram.observe(0.5)
+
+    assert histogram.render()[2:] == [
+        'x_bucket{le="1"} 1',
+        'x_bucket{le="2"} 1',
+        'x_bucket{le="+Inf"} 2',
+        'x_sum 5.5',
+        'x_count 2',
+    ]
+
+def test_stats_gauges_are_exposed(client):
+    metrics_text = client.get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE db_pool_timeouts_total counter' in metrics_text
+    assert sample(metrics_text, 'db_pool_max_size ') == 10
@@ -0,0 +1,80 @@
+# test_passwords.py
+import threading
+import pytest
+import app as app_module
+import passwords
+from werkzeug.security import generate_password_hash
+from passwords import PasswordHasher, HashingBusy
+
+CHEAP_METHOD = 'pbkdf2:sha256:1'
+
+@pytest.fixture
+def blocked_hasher(monkeypatch):
+    """A one-thread hasher with no queue, whose only worker is stuck until the test ends."""
+    hasher = PasswordHasher(CHEAP_METHOD, max_workers=1, max_pending=0, timeout=5.0)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash(password, method):
+        started.set()
+        release.wait()
+        return generate_password_hash(password, method)
+
+    monkeypatch.setattr(passwords, 'generate_password_hash', slow_hash)
+    worker = threading.Thread(target=hasher.hash, args=('first',))
+    worker.start()
+    started.wait()
+    yield hasher
+    release.set()
+    worker.join()
+
+def test_saturated_pool_fails_fast(blocked_hasher):
+    with pytest.raises(HashingBusy):
+        blocked_hasher.verify(generate_password_hash('secret', CHEAP_METHOD), 'secret')
+    assert blocked_hasher.rejected == 1
+
+def test_saturated_login_is_a_429(client, fake_db, monkeypatch, blocked_hasher):
+    monkeypatch.setattr(app_module, 'password_hasher', blocked_hasher)
+    fake_db.on('FROM users WHERE email', [{'id': 1, 'name': 'A', 'email': 'a@example.com', 'password': 'pbkdf2:sha256:1$x$y'}])
+
+    response = client.post('/login', json={"email": "a@example.com", "password": "secret"})
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+
+def test_admission_is_released_after_each_operation():
+    hasher = PasswordHasher(CHEAP_METHOD, max_workers=1, max_pending=0)
+
+    for _ in range(3):
+        assert hasher.verify(hasher.hash('secret'), 'secret')
+
+@pytest.mark.parametrize("method, stored_method, expected", [
+    ('pbkdf2', 'pbkdf2', False),
+    ('pbkdf2', 'pbkdf2:sha256:1', True),
+    ('pbkdf2:sha256:1', 'pbkdf2:sha256:1', False),
+    ('scrypt', 'scrypt:32768:8:1', False),
+    ('scrypt:16384:8:1', 'scrypt:32768:8:1', True),
+    (CHEAP_METHOD, 'scrypt', True),
+])
+def test_needs_rehash_compares_expanded_methods(method, stored_method, expected):
+    hasher = PasswordHasher(method, max_workers=1, max_pending=0)
+
+    assert hasher.needs_rehash(generate_password_hash('secret', stored_method)) is expected
+
+@pytest.mark.parametrize("stored_method, rehashed", [('pbkdf2:sha256:1', True), ('pbkdf2:sha256:2', False)])
+def test_login_rehashes_outdated_hashes(client, fake_db, monkeypatch, stored_method, rehashed):
+    monkeypatch.setattr(app_module, 'password_hasher', PasswordHasher('pbkdf2:sha256:2', max_workers=1, max_pending=1))
+    old_hash = generate_password_hash('secret', stored_method)
+    fake_db.on('FROM users WHERE email', [{'id': 7, 'name': 'A', 'email': 'a@example.com', 'password': old_hash}])
+
+    response = client.post('/login', json={"email": "a@example.com", "password": "secret"})
+
+    assert response.status_code == 200
+    updates = [(query, params) for query, params in fake_db.queries if query.startswith('UPDATE users SET password')]
+    if not rehashed:
+        assert updates == []
+        return
+    ((query, (new_hash, user_id, expected_old_hash)),) = updates
+    # The old hash guards against overwriting a password changed in the meantime
+    assert query.endswith('WHERE id = %s AND password = %s')
+    assert (user_id, expected_old_hash) == (7, old_hash)
+    assert new_hash.startswith('pbkdf2:sha256:2$')
@@ -0,0 +1,61 @@
+# test_qr_fast.py
+import random
+import string
+import pytest
+import qrcode
+from qr_fast import FastMaskQRCode
+from qr_render import ERROR_CORRECTION_LEVELS, build_qr, normalize_render_options
+
+def encode(qr_class, data, **kwargs):
+    qr = qr_class(**kwargs)
+    qr.add_data(data)
+    qr.make(fit=kwargs.get('version') is None)
+    return qr
+
+def payloads(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        length = rng.choice([1, 10, 50, 200, 600])
+        yield ''.join(rng.choice(string.printable) for _ in range(length))
+
+@pytest.mark.parametrize('error_correction', sorted(ERROR_CORRECTION_LEVELS))
+def test_fast_masks_match_stock_qrcode(error_correction):
+    level = ERROR_CORRECTION_LEVELS[error_correction]
+    for data in payloads(40, seed=ord(error_correction)):
+        expected = encode(qrcode.QRCode, data, error_correction=level)
+        actual = encode(FastMaskQRCode, data, error_correction=level)
+        assert actual.version == expected.version
+        assert actual.modules == expected.modules, data
+
+@pytest.mark.parametrize('profile', ['default', 'fast'])
+@pytest.mark.parametrize('version', [1, 7, 25])
+def test_pinned_version_is_honoured(profile, version):
+    qr = build_qr('QR', normalize_render_options({'version': version, 'profile': profile}))
+
+    assert qr.version == version
+    assert qr.modules_count == 17 + 4 * version
+    assert qr.modules == encode(qrcode.QRCode, 'QR', version=version).modules
+
+@pytest.mark.parametrize('profile', ['default', 'fast'])
+@pytest.mark.parametrize('mask_pattern', range(8))
+def test_pinned_mask_is_honoured(profile, mask_pattern):
+    options = normalize_render_options({'mask_pattern': mask_pattern, 'error_correction': 'Q', 'profile': profile})
+    qr = build_qr('https://example.com', options)
+
+    expected = encode(
+        qrcode.QRCode, 'https://example.com',
+        mask_pattern=mask_pattern, error_correction=qrcode.constants.ERROR_CORRECT_Q,
+    )
+    assert qr.mask_pattern == mask_pattern
+    assert qr.modules == expected.modules
+
+@pytest.mark.parametrize('profile', ['default', 'fast'])
+def test_data_overflow_is_a_bad_request(client, profile):
+    body = {"data": "x" * 100, "version": 1, "error_correction": "H", "profile": profile}
+
+    response = client.post('/generate-qr', json=body)
+    assert response.status_code == 400
+    assert "too long" in response.json["error"]
+
+    response = client.get('/qr', query_string={**body, "data": "x" * 100})
+    assert response.status_code == 400
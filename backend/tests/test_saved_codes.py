@@ -0,0 +1,85 @@
+# test_saved_codes.py
+import io
+import base64
+import app as app_module
+from PIL import Image
+from conftest import log_in
+from qr_render import normalize_render_options, render_image
+
+def uploaded_png(colour):
+    img_buffer = io.BytesIO()
+    Image.new('RGB', (10, 10), colour).save(img_buffer, format="PNG")
+    return base64.b64encode(img_buffer.getvalue()).decode('ascii')
+
+def test_shared_assets_never_store_client_images(client, fake_db, monkeypatch):
+    acquired = []
+    monkeypatch.setattr(app_module, 'acquire_assets', lambda cur, assets: acquired.append(assets))
+    fake_db.on('RETURNING qr_code_count', [{'qr_code_count': 1}])
+
+    for user_id, colour in ((1, 'red'), (2, 'blue')):
+        log_in(client, user_id)
+        response = client.post('/user/save-qr', json={"inputText": "https://example.com", "qrImage": uploaded_png(colour)})
+        assert response.status_code == 201
+
+    expected = render_image("https://example.com", {**normalize_render_options(), 'format': 'png'})
+    (first_hash, first), (second_hash, second) = [next(iter(assets.items())) for assets in acquired]
+    assert first_hash == second_hash
+    assert first[1] == second[1] == expected
+
+def test_save_without_an_uploaded_image(client, fake_db, monkeypatch):
+    monkeypatch.setattr(app_module, 'acquire_assets', lambda cur, assets: None)
+    fake_db.on('RETURNING qr_code_count', [{'qr_code_count': 1}])
+    log_in(client, 1)
+
+    response = client.post('/user/save-qr', json={"inputText": "hello"})
+    assert response.status_code == 201
+
+def test_deleted_accounts_cannot_update_their_profile(client, fake_db):
+    log_in(client, 1)
+
+    response = client.post('/user/update-profile', json={"name": "A", "email": "a@example.com", "current_password": "secret"})
+
+    assert response.status_code == 404
+    assert not any(query.startswith('UPDATE') for query, _ in fake_db.queries)
+
+def test_code_queries_check_the_owner_is_live(client, fake_db):
+    log_in(client, 1)
+
+    client.get('/user/qr-codes')
+    client.get('/user/qr-codes/5/image')
+
+    assert len(fake_db.queries) == 2
+    assert all('deleted_at IS NULL' in query for query, _ in fake_db.queries)
+
+def test_import_takes_asset_references_in_one_pass(client, fake_db, monkeypatch):
+    calls = []
+    monkeypatch.setitem(app_module.QR_IMPORT_CONFIG, 'batch_size', 2)
+    monkeypatch.setattr(app_module, 'store_asset_images', lambda cur, assets: calls.append(('store', fake_db.commits, set(assets))))
+    monkeypatch.setattr(app_module, 'acquire_assets', lambda cur, assets: calls.append(('acquire', fake_db.commits, dict(assets))))
+    monkeypatch.setattr(app_module, 'execute_values', lambda cur, query, rows, **kwargs: calls.append(('insert', fake_db.commits, rows)))
+    fake_db.on('RETURNING qr_code_count', [{'qr_code_count': 4}])
+    log_in(client, 1)
+
+    response = client.post('/user/qr-codes/import?format=ndjson', data='"b"\n"a"\n"c"\n"a"\n')
+
+    assert response.status_code == 201
+    assert response.json["imported"] == 4
+    (_, first_commits, first), (_, second_commits, second), (acquire, commits, references), (insert, _, rows) = calls
+    # Each batch's images are committed on their own, before any reference is taken
+    assert (first_commits, second_commits, commits) == (0, 1, 2)
+    assert (acquire, insert) == ('acquire', 'insert')
+    assert set(references) == first | second
+    assert sorted(count for _, _, _, count in references.values()) == [1, 1, 2]
+    assert all(png_bytes is None for _, png_bytes, _, _ in references.values())
+    assert len(rows) == 4
+    assert fake_db.commits == 3
+
+def test_ndjson_export_does_not_read_images(client, fake_db):
+    log_in(client, 1)
+
+    for export_format in ("ndjson", "zip"):
+        client.get('/user/qr-codes/export', query_string={"format": export_format}).get_data()
+
+    (ndjson_query, _), (zip_query, _) = fake_db.queries
+    assert 'NULL AS qr_image' in ndjson_query and 'a.qr_image' not in ndjson_query
+    assert 'COALESCE(q.qr_image, a.qr_image) AS qr_image' in zip_query
@@ -0,0 +1,144 @@
+# test_sessions.py
+import time
+import pytest
+from datetime import timedelta
+from flask import Flask, session
+from itsdangerous import Signer
+from sessions import MemorySessionStore, RedisSessionStore, ServerSideSessionInterface
+
+class FakeRedis:
+    """Local stand-in for a Redis client, storing bytes like the real one."""
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value.encode('utf-8')
+        self.ttls[key] = ttl
+
+    def expire(self, key, ttl):
+        if key in self.values:
+            self.ttls[key] = ttl
+
+    def delete(self, key):
+        self.values.pop(key, None)
+        self.ttls.pop(key, None)
+
+class RecordingStore(MemorySessionStore):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def set(self, sid, payload, ttl):
+        self.calls.append('set')
+        super().set(sid, payload, ttl)
+
+    def touch(self, sid, ttl):
+        self.calls.append('touch')
+        super().touch(sid, ttl)
+
+    def delete(self, sid):
+        self.calls.append('delete')
+        super().delete(sid)
+
+def make_app(store):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=30)
+    app.session_interface = ServerSideSessionInterface(store)
+
+    @app.route('/login')
+    def login():
+        session['user_id'] = 1
+        session.permanent = True
+        return ''
+
+    @app.route('/whoami')
+    def whoami():
+        return str(session.get('user_id'))
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return ''
+
+    return app
+
+@pytest.fixture
+def store():
+    return RecordingStore()
+
+@pytest.fixture
+def session_client(store):
+    return make_app(store).test_client()
+
+def test_sessions_are_only_written_when_modified(session_client, store):
+    session_client.get('/login')
+    store.calls.clear()
+
+    assert session_client.get('/whoami').get_data(as_text=True) == '1'
+    assert store.calls == ['touch']
+
+def test_reads_slide_the_expiry(session_client, store):
+    session_client.get('/login')
+    (sid,) = store._entries
+    store._entries[sid] = (time.time() + 5, store._entries[sid][1])
+
+    response = session_client.get('/whoami')
+
+    assert store._entries[sid][0] > time.time() + 60
+    assert 'Expires=' in response.headers['Set-Cookie']
+
+def test_untouched_anonymous_sessions_are_not_stored(session_client, store):
+    response = session_client.get('/whoami')
+
+    assert response.get_data(as_text=True) == 'None'
+    assert store.calls == []
+    assert 'Set-Cookie' not in response.headers
+
+def test_logout_deletes_the_stored_session(session_client, store):
+    session_client.get('/login')
+
+    response = session_client.get('/logout')
+
+    assert store.calls[-1] == 'delete'
+    assert store._entries == {}
+    assert 'session=;' in response.headers['Set-Cookie']
+    assert session_client.get('/whoami').get_data(as_text=True) == 'None'
+
+def test_bad_signatures_start_a_new_session(session_client, store):
+    session_client.get('/login')
+    (sid,) = store._entries
+    forged = Signer('other key', salt='session-id').sign(sid).decode('ascii')
+    session_client.set_cookie('session', forged, domain='localhost')
+
+    assert session_client.get('/whoami').get_data(as_text=True) == 'None'
+
+def test_memory_sweep_drops_only_expired_entries():
+    store = MemorySessionStore()
+    store.set('old', 'payload', -1)
+    store.set('live', 'payload', 60)
+
+    assert store.sweep() == 1
+    assert store.get('old') is None
+    assert store.get('live') == 'payload'
+
+def test_redis_store_round_trip_with_a_fake_client():
+    redis = FakeRedis()
+    client = make_app(RedisSessionStore(client=redis, prefix='s:')).test_client()
+
+    client.get('/login')
+    (key,) = redis.values
+    assert key.startswith('s:')
+    assert redis.ttls[key] == 1800
+
+    redis.ttls[key] = 5
+    assert client.get('/whoami').get_data(as_text=True) == '1'
+    assert redis.ttls[key] == 1800
+
+    client.get('/logout')
+    assert redis.values == {}
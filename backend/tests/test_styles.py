@@ -0,0 +1,120 @@
+# test_styles.py
+import io
+import base64
+import struct
+import zlib
+import pytest
+import qrcode
+import numpy as np
+from PIL import Image
+from conftest import log_in
+from qr_styles import StyleTemplate, codeword_layout, normalize_style
+
+def png_bytes(width, height):
+    img_buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (255, 0, 0, 255)).save(img_buffer, format="PNG")
+    return img_buffer.getvalue()
+
+def png_declaring(width, height):
+    """A tiny PNG whose header claims width x height pixels."""
+    def chunk(chunk_type, data):
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(b'\x00' * 1024)) + chunk(b'IEND', b'')
+
+def test_oversized_logos_are_rejected_before_decoding():
+    logo = png_declaring(6000, 6000)
+    assert len(logo) < 20 * 1024
+
+    with pytest.raises(ValueError, match='pixels'):
+        StyleTemplate(normalize_style({}, logo), logo)
+
+def test_register_rejects_oversized_logos(client, fake_db):
+    log_in(client, 1)
+
+    response = client.post('/user/styles', json={"logo": base64.b64encode(png_declaring(6000, 6000)).decode('ascii')})
+
+    assert response.status_code == 400
+    assert fake_db.queries == []
+
+def test_register_accepts_small_logos(client, fake_db):
+    log_in(client, 1)
+
+    response = client.post('/user/styles', json={"module_shape": "circle", "logo": base64.b64encode(png_bytes(64, 64)).decode('ascii')})
+
+    assert response.status_code == 201
+    assert len(response.json["style"]) == 64
+
+def test_unknown_styles_are_remembered(client, fake_db):
+    style_id = 'a' * 64
+
+    for _ in range(3):
+        response = client.get('/qr', query_string={"data": "hello", "style": style_id})
+        assert response.status_code == 400
+
+    assert len(fake_db.queries) == 1
+
+def test_style_lookup_errors_are_json(client, fake_db):
+    def fail(params):
+        raise RuntimeError("database is down")
+    fake_db.on('FROM qr_styles', fail)
+
+    response = client.get('/qr', query_string={"data": "hello", "style": 'b' * 64})
+
+    assert response.status_code == 500
+    assert "error" in response.json
+
+def test_styled_export_uses_a_single_connection(client, fake_db):
+    style = normalize_style({"module_shape": "circle"})
+    fake_db.on('FROM qr_styles', [{'definition': style, 'logo': None}])
+    fake_db.on('FROM qr_codes', [
+        {'id': id, 'qr_text': f"code {id}", 'qr_image': None, 'render_options': {"style": 'c' * 64}}
+        for id in (1, 2)
+    ])
+    log_in(client, 1)
+
+    response = client.get('/user/qr-codes/export', query_string={"format": "zip"})
+    response.get_data()
+
+    assert response.status_code == 200
+    assert fake_db.max_open_connections == 1
+
+@pytest.mark.parametrize("version", [1, 2, 3, 7])
+def test_codeword_layout_matches_qrcode_placement(version):
+    qr = qrcode.QRCode(version=version, error_correction=qrcode.constants.ERROR_CORRECT_H, mask_pattern=0)
+    qr.add_data('QR')
+    qr.make(fit=False)
+    codewords, _, _ = codeword_layout(version, 'H')
+    original = np.array(qr.modules, dtype=bool)
+
+    for index in (0, 5, len(qr.data_cache) - 1):
+        qr.data_cache[index] ^= 0xFF
+        qr.makeImpl(False, 0)
+        qr.data_cache[index] ^= 0xFF
+        assert ((np.array(qr.modules, dtype=bool) != original) == (codewords == index)).all()
+
+@pytest.mark.parametrize("data, version, border, logo_size", [
+    ("QR", 1, 4, 0.3),
+    ("QR", 1, 20, 0.3),
+    ("QR", 2, 20, 0.3),
+    ("https://example.com", None, 20, 0.2),
+    ("https://example.com", None, 4, 0.3),
+])
+def test_logos_stay_within_error_correction(data, version, border, logo_size):
+    style = normalize_style({"logo_size": logo_size}, png_bytes(64, 64))
+    qr = qrcode.QRCode(version=version, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=4, border=border)
+    qr.add_data(data)
+    qr.make(fit=version is None)
+    box_size = 4
+
+    def pixels(template):
+        return np.asarray(Image.open(io.BytesIO(template.render_png(qr.modules, box_size, border, 'H'))).convert('RGB'))
+    changed = (pixels(StyleTemplate(style, png_bytes(64, 64))) != pixels(StyleTemplate(style))).any(axis=2)
+    n = len(qr.modules)
+    covered = changed[border * box_size:(border + n) * box_size, border * box_size:(border + n) * box_size]
+    covered = covered.reshape(n, box_size, n, box_size).any(axis=(1, 3))
+
+    codewords, blocks, capacity = codeword_layout(qr.version, 'H')
+    wrong = np.unique(codewords[covered & (codewords >= 0)])
+    assert covered.any()
+    assert (np.bincount(blocks[wrong], minlength=len(capacity)) <= capacity).all()
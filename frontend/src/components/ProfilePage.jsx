@@ -1,6 +1,6 @@
 // src/components/ProfilePage.jsx
 import React, { useEffect, useState } from "react";
-import { getGeneratedQRCodes, deleteQRCode, logoutUser } from "../services/userService"; // Import the necessary service functions
+import { getGeneratedQRCodes, getQRCodeImageUrl, deleteQRCode, logoutUser } from "../services/userService"; // Import the necessary service functions
 import { Link, useNavigate } from "react-router-dom";
 import EditProfilePopup from "./EditProfilePopup"; // Import the Edit Profile popup
 import { toast } from "react-toastify"; // Import toast for notifications
@@ -8,6 +8,8 @@ import { Oval } from "react-loader-spinner"; // Import spinner from react-loader
 
 const ProfilePage = ({ user, userLoading, setUser }) => {
   const [qrCodes, setQRCodes] = useState([]); // State to store fetched QR codes
+  const [nextCursor, setNextCursor] = useState(null); // Token for the next page of QR codes
+  const [loadingMore, setLoadingMore] = useState(false); // State to track loading of further pages
   const [error, setError] = useState(null); // State for any error messages
   const [loading, setLoading] = useState(true); // State to show loading indicator
   const [showEditProfilePopup, setShowEditProfilePopup] = useState(false); // State to control Edit Profile popup visibility
@@ -26,8 +28,9 @@ const ProfilePage = ({ user, userLoading, setUser }) => {
     // Fetch QR codes associated with the logged-in user
     async function fetchQRCodes() {
       try {
-        const codes = await getGeneratedQRCodes();
+        const { qrCodes: codes, nextCursor: cursor } = await getGeneratedQRCodes();
         setQRCodes(codes); // Update state with the fetched QR codes
+        setNextCursor(cursor);
       } catch (err) {
         setError("Failed to fetch QR codes.");
       } finally {
@@ -38,6 +41,18 @@ const ProfilePage = ({ user, userLoading, setUser }) => {
     fetchQRCodes();
   }, [user, userLoading]); // Fetch data only after user and userLoading states are resolved
 
+  // Fetch the next page of QR codes
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const { qrCodes: codes, nextCursor: cursor } = await getGeneratedQRCodes(nextCursor);
+      setQRCodes([...qrCodes, ...codes]); // Append the new page to the list
+      setNextCursor(cursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Handle the deletion of a QR code
   const handleDelete = async (id) => {
     // Ask for confirmation before deletion
@@ -105,7 +120,8 @@ const ProfilePage = ({ user, userLoading, setUser }) => {
             {qrCodes.map((code) => (
               <div key={code.id} className="p-4 border border-neutral-200 rounded-lg bg-[#202020]">
                 <img
-                  src={`data:image/png;base64,${code.qr_image}`}
+                  src={getQRCodeImageUrl(code)}
+                  loading="lazy"
                   alt="QR Code"
                   className="w-full h-auto mb-2 border border-neutral-300 rounded-lg"
                 />
@@ -130,6 +146,19 @@ const ProfilePage = ({ user, userLoading, setUser }) => {
           <div className="text-center text-neutral-400">No QR codes generated yet.</div>
         )}
 
+        {/* Load More Button, shown while there are more pages */}
+        {nextCursor && (
+          <div className="text-center">
+            <button
+              onClick={handleLoadMore}
+              className="w-full py-3 flex justify-center bg-[#252525] hover:bg-neutral-600 duration-200 rounded"
+              disabled={loadingMore} // Disable button while loading
+            >
+              {loadingMore ? <Oval height={24} width={24} color="#ffffff" ariaLabel="loading" /> : "Load more"}
+            </button>
+          </div>
+        )}
+
         {/* Go Back and Edit Profile Buttons */}
         <div className="text-center mt-6 space-x-4">
           <Link to="/" className="text-neutral-400 hover:text-neutral-300">
@@ -82,10 +82,11 @@ export async function logoutUser(setUser) {
   }
 }
 
-// Function to get generated QR codes for the logged-in user
-export async function getGeneratedQRCodes() {
+// Function to get one page of generated QR codes for the logged-in user
+export async function getGeneratedQRCodes(cursor = null) {
   try {
-    const response = await fetch(`${API_BASE_URL}/user/qr-codes`, {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+    const response = await fetch(`${API_BASE_URL}/user/qr-codes${query}`, {
       method: "GET",
       credentials: "include", // Important for session-based auth
       headers: {
@@ -95,13 +96,19 @@ export async function getGeneratedQRCodes() {
 
     if (!response.ok) throw new Error("Failed to fetch QR codes");
     const qrCodes = await response.json();
-    return qrCodes;
+    const nextCursor = response.headers.get("X-Next-Cursor"); // Token for the next page, null on the last one
+    return { qrCodes, nextCursor };
   } catch (error) {
     console.error(error);
-    return [];
+    return { qrCodes: [], nextCursor: null };
   }
 }
 
+// Function to get the image URL of a saved QR code
+export function getQRCodeImageUrl(code) {
+  return `${API_BASE_URL}${code.image_url}`;
+}
+
 // Function to handle user login
 // src/services/userService.js
 export async function loginUser(email, password) {